@@ -1,14 +1,17 @@
-import requests
+from common.http_client import configure_from_argv, get_client
+from common.records import PostBatch
 
-url = 'https://jsonplaceholder.typicode.com/posts'
+configure_from_argv()
+client = get_client()
 
-requestsGet = requests.get(url)
+requestsGet = client.get('posts')
 
 if requestsGet.status_code == 200:
-    posts = requestsGet.json()
-    even_user_posts = [post for post in posts if post['userId'] % 2 == 0]
+    # Посты по столбцам, фильтр по чётному userId - одна векторная операция
+    posts = PostBatch.from_json(requestsGet.json())
+    even_user_posts = posts.where(posts.even_user())
 
     for post in even_user_posts:
-        print(f"UserId: {post['userId']},\nPostId: {post['id']},\nTitle: {post['title']},\nBody: {post['body']}\n")
+        print(f"UserId: {post.user_id},\nPostId: {post.id},\nTitle: {post.title},\nBody: {post.body}\n")
 else:
     print(f"Не удалось получить данные. Статус код: {requestsGet.status_code}")
\ No newline at end of file
@@ -1,7 +1,9 @@
-import requests
 import json
 
-url = 'https://jsonplaceholder.typicode.com/posts'
+from common.http_client import configure_from_argv, get_client
+
+configure_from_argv()
+client = get_client()
 
 new_post = {
     'UserId': 1,
@@ -9,7 +11,7 @@ new_post = {
     'body': 'Это содержимое тестового поста. Здесь может быть любой текст.'
 }
 
-requestsPost = requests.post(url, json=new_post)
+requestsPost = client.post('posts', json=new_post)
 
 if requestsPost.status_code == 201:
     created_post = requestsPost.json()
@@ -1,8 +1,11 @@
-import requests
 import json
 
+from common.http_client import configure_from_argv, get_client
+
+configure_from_argv()
+client = get_client()
+
 post_id = 100
-url = f'https://jsonplaceholder.typicode.com/posts/{post_id}'
 
 updated_post = {
     'userId': 1,
@@ -10,7 +13,7 @@ updated_post = {
     'body': 'Это обновленное содержимое тестового поста.'
 }
 
-requestsPut = requests.put(url, json=updated_post)
+requestsPut = client.put(f'posts/{post_id}', json=updated_post)
 
 if requestsPut.status_code == 200:
     updated_post_response = requestsPut.json()
@@ -0,0 +1,90 @@
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_DB_PATH = 'posts.db'
+
+CONNECTION_PRAGMAS = (
+    # WAL: читатели GUI и фоновые писатели не блокируют друг друга
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+)
+
+
+def fold_case(value):
+    # Свёртка регистра для LIKE: встроенные lower() и LIKE в SQLite понимают только ASCII,
+    # а триграммный индекс сворачивает регистр любых букв
+    return value.lower() if isinstance(value, str) else value
+
+
+# Соединения с одной базой: одно на поток, переиспользуется между вызовами
+class ConnectionManager:
+    def __init__(self, path=DEFAULT_DB_PATH, timeout=30.0, cached_statements=256):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def _open(self):
+        # check_same_thread=False только ради close_all при выходе, пока соединение живо им пользуется один поток
+        conn = sqlite3.connect(self.path, timeout=self.timeout, cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.create_function('fold_case', 1, fold_case, deterministic=True)
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def close_thread(self):
+        # Вызывается в конце рабочего потока, чтобы не держать его соединение
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(path=DEFAULT_DB_PATH):
+    key = os.path.abspath(path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConnectionManager(key)
+            atexit.register(manager.close_all)
+        return manager
+
+
+def get_connection(path=DEFAULT_DB_PATH):
+    return get_manager(path).connection()
@@ -0,0 +1,69 @@
+import time
+
+from common.ingest import batched
+from common.queries import POST_COLUMNS
+
+# Старые сборки SQLite ограничивают число параметров запроса 999
+MAX_PARAMS = 900
+
+# Сколько последних удалений можно отменить
+JOURNAL_DEPTH = 20
+
+
+def placeholders(count):
+    return ', '.join('?' * count)
+
+
+def delete_posts(conn, ids, journal=True):
+    # Удаление одной транзакцией кусками WHERE id IN (...); строки перед удалением копируются в журнал.
+    # Возвращает (номер пачки в журнале или None, число удалённых строк)
+    ids = sorted(set(post_id for post_id in ids if post_id is not None))
+    if not ids:
+        return None, 0
+    batch_id = None
+    deleted = 0
+    with conn:
+        if journal:
+            batch_id = conn.execute('INSERT INTO delete_batches (deleted_at, count) VALUES (?, 0)',
+                                    (time.time(),)).lastrowid
+        for chunk in batched(ids, MAX_PARAMS):
+            condition = f'id IN ({placeholders(len(chunk))})'
+            if journal:
+                conn.execute(f'INSERT INTO deleted_posts (batch_id, {POST_COLUMNS}) '
+                             f'SELECT ?, {POST_COLUMNS} FROM posts WHERE {condition}', [batch_id] + chunk)
+            deleted += conn.execute(f'DELETE FROM posts WHERE {condition}', chunk).rowcount
+        if journal:
+            conn.execute('UPDATE delete_batches SET count = ? WHERE id = ?', (deleted, batch_id))
+            trim_journal(conn)
+    return batch_id, deleted
+
+
+def trim_journal(conn, keep=JOURNAL_DEPTH):
+    conn.execute('DELETE FROM deleted_posts WHERE batch_id IN '
+                 '(SELECT id FROM delete_batches ORDER BY id DESC LIMIT -1 OFFSET ?)', (keep,))
+    conn.execute('DELETE FROM delete_batches WHERE id IN '
+                 '(SELECT id FROM delete_batches ORDER BY id DESC LIMIT -1 OFFSET ?)', (keep,))
+
+
+def last_delete(conn):
+    # (номер пачки, число строк) последнего удаления, которое ещё можно отменить
+    return conn.execute('SELECT id, count FROM delete_batches ORDER BY id DESC LIMIT 1').fetchone()
+
+
+def undo_delete(conn, batch_id=None):
+    # Возвращает строки из журнала в posts. Если id уже занят новой записью, строка не восстанавливается.
+    # Возвращает список восстановленных id
+    with conn:
+        if batch_id is None:
+            last = last_delete(conn)
+            if last is None:
+                return []
+            batch_id = last[0]
+        ids = [row[0] for row in conn.execute(
+            'SELECT id FROM deleted_posts WHERE batch_id = ? AND id NOT IN (SELECT id FROM posts) ORDER BY id',
+            (batch_id,))]
+        conn.execute(f'INSERT INTO posts ({POST_COLUMNS}) SELECT {POST_COLUMNS} FROM deleted_posts '
+                     f'WHERE batch_id = ? ORDER BY id ON CONFLICT(id) DO NOTHING', (batch_id,))
+        conn.execute('DELETE FROM deleted_posts WHERE batch_id = ?', (batch_id,))
+        conn.execute('DELETE FROM delete_batches WHERE id = ?', (batch_id,))
+    return ids
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.environ.get('POSTS_HTTP_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'posts-http'))
+
+
+# Дисковый кэш ответов: ревалидация по ETag/Last-Modified, TTL и вытеснение LRU по размеру
+class HttpCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=60, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(directory, 'index.json')
+        os.makedirs(directory, exist_ok=True)
+        self.entries = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return OrderedDict()
+        # Порядок в индексе - от давно использованных к недавним
+        entries = OrderedDict()
+        for url, entry in sorted(items.items(), key=lambda item: item[1].get('used_at', 0)):
+            if os.path.exists(os.path.join(self.directory, entry['file'])):
+                entries[url] = entry
+        return entries
+
+    def _save_index(self):
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self._index_path)
+
+    def lookup(self, url):
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                entry['used_at'] = time.time()
+                self.entries.move_to_end(url)
+            return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, entry):
+        with open(os.path.join(self.directory, entry['file']), 'rb') as f:
+            return f.read()
+
+    def iter_content(self, entry, chunk_size=65536):
+        with open(os.path.join(self.directory, entry['file']), 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def touch(self, url):
+        # Сервер ответил 304: продлеваем срок жизни без перезаписи тела
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                entry['stored_at'] = entry['used_at'] = time.time()
+                self.entries.move_to_end(url)
+                self._save_index()
+
+    def store(self, url, content, headers):
+        writer = self.open_writer(url, headers)
+        writer.write(content)
+        return writer.commit()
+
+    def open_writer(self, url, headers):
+        return CacheWriter(self, url, headers)
+
+    def _commit(self, url, file_name, headers, digest, size):
+        with self._lock:
+            now = time.time()
+            entry = {
+                'file': file_name,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'digest': digest,
+                'size': size,
+                'stored_at': now,
+                'used_at': now,
+            }
+            self.entries[url] = entry
+            self.entries.move_to_end(url)
+            self._evict()
+            self._save_index()
+        return entry
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self.entries.values())
+        while total > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            total -= entry['size']
+            try:
+                os.remove(os.path.join(self.directory, entry['file']))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for entry in self.entries.values():
+                try:
+                    os.remove(os.path.join(self.directory, entry['file']))
+                except OSError:
+                    pass
+            self.entries.clear()
+            self._save_index()
+
+
+# Запись тела ответа в кэш по частям, по мере скачивания
+class CacheWriter:
+    def __init__(self, cache, url, headers):
+        self.cache = cache
+        self.url = url
+        self.headers = headers
+        self.file_name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        self.path = os.path.join(cache.directory, self.file_name)
+        self.tmp_path = f'{self.path}.{threading.get_ident()}.tmp'
+        self.file = open(self.tmp_path, 'wb')
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.hash.update(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        return self.cache._commit(self.url, self.file_name, self.headers, self.hash.hexdigest(), self.size)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+# Результат запроса через кэш: changed=False, если тело совпадает с закэшированным
+class CachedResponse:
+    def __init__(self, content, changed, source):
+        self.content = content
+        self.changed = changed
+        self.source = source
+
+    def json(self):
+        return json.loads(self.content)
+
+
+# Потоковый вариант: тело отдаётся чанками, changed известен сразу для кэша и после чтения для сети
+class CachedStream:
+    def __init__(self, chunks, content_length, source, changed=None):
+        self.chunks = chunks
+        self.content_length = content_length
+        self.source = source
+        self.changed = changed
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache()
+        return _cache
@@ -0,0 +1,219 @@
+import argparse
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from common.http_cache import CachedResponse, CachedStream, get_cache
+from common.instrument import Histogram, span
+
+# Переопределяется переменной POSTS_API_URL или флагом --base-url, например для common/stub_server.py
+BASE_URL = os.environ.get('POSTS_API_URL', 'https://jsonplaceholder.typicode.com')
+
+
+# Время ответа по каждому виду запроса. Гистограмма занимает постоянную память, сколько бы
+# запросов ни сделал долго работающий GUI; процентили - с точностью корзины (до 25%)
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = defaultdict(Histogram)
+        self.errors = defaultdict(int)
+
+    def record(self, key, seconds, ok=True):
+        with self._lock:
+            self.histograms[key].add(seconds)
+            if not ok:
+                self.errors[key] += 1
+
+    def summary(self):
+        result = {}
+        with self._lock:
+            for key, histogram in self.histograms.items():
+                result[key] = {
+                    'count': histogram.count,
+                    'errors': self.errors[key],
+                    'mean_ms': round(histogram.total / histogram.count * 1000, 3),
+                    'p50_ms': round(histogram.percentile(0.5) * 1000, 3),
+                    'p99_ms': round(histogram.percentile(0.99) * 1000, 3),
+                    'max_ms': round(histogram.max * 1000, 3),
+                }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.errors.clear()
+
+
+# Общий HTTP клиент: пул keep-alive соединений, повторы с backoff, таймауты и метрики.
+# requests импортируется при создании клиента: GUI, которым сеть нужна не сразу, стартуют без него
+class HttpClient:
+    def __init__(self, base_url=BASE_URL, timeout=10, retries=3, backoff=0.3, pool_size=16, max_workers=8):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.metrics = RequestMetrics()
+
+        # POST не повторяем: повтор может создать запись дважды
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, metric=None, **kwargs):
+        import requests
+        kwargs.setdefault('timeout', self.timeout)
+        key = f"{method} {metric or path}"
+        started = time.perf_counter()
+        try:
+            with span(f'http {key}', 'network'):
+                response = self.session.request(method, self.url(path), **kwargs)
+        except requests.RequestException:
+            self.metrics.record(key, time.perf_counter() - started, ok=False)
+            raise
+        self.metrics.record(key, time.perf_counter() - started, ok=response.ok)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def get_cached(self, path, cache=None, **kwargs):
+        # GET через дисковый кэш: свежая запись - без запроса, устаревшая - условный запрос с ревалидацией
+        cache = cache or get_cache()
+        url = self.url(path)
+        entry = cache.lookup(url)
+        if entry is not None and cache.is_fresh(entry):
+            return CachedResponse(cache.read(entry), changed=False, source='cache')
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            headers.update(cache.conditional_headers(entry))
+        response = self.get(path, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            cache.touch(url)
+            return CachedResponse(cache.read(entry), changed=False, source='revalidated')
+
+        response.raise_for_status()
+        new_entry = cache.store(url, response.content, response.headers)
+        changed = entry is None or entry['digest'] != new_entry['digest']
+        return CachedResponse(response.content, changed=changed, source='network')
+
+    def stream_cached(self, path, cache=None, chunk_size=65536, **kwargs):
+        # Как get_cached, но тело читается чанками и пишется в кэш по ходу скачивания
+        import requests
+        cache = cache or get_cache()
+        url = self.url(path)
+        entry = cache.lookup(url)
+        if entry is not None and cache.is_fresh(entry):
+            return CachedStream(cache.iter_content(entry, chunk_size), entry['size'], 'cache', changed=False)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            headers.update(cache.conditional_headers(entry))
+        response = self.get(path, headers=headers, stream=True, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            cache.touch(url)
+            return CachedStream(cache.iter_content(entry, chunk_size), entry['size'], 'revalidated', changed=False)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+
+        content_length = int(response.headers.get('Content-Length') or 0) or None
+        stream = CachedStream(None, content_length, 'network')
+
+        def chunks():
+            writer = cache.open_writer(url, response.headers)
+            try:
+                for chunk in response.iter_content(chunk_size):
+                    writer.write(chunk)
+                    yield chunk
+            except BaseException:
+                writer.abort()
+                raise
+            finally:
+                response.close()
+            new_entry = writer.commit()
+            stream.changed = entry is None or entry['digest'] != new_entry['digest']
+
+        stream.chunks = chunks()
+        return stream
+
+    def map(self, func, items, max_workers=None):
+        # Параллельный обход с ограничением числа одновременных запросов, порядок результатов сохраняется
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def fetch_posts(self, post_ids, max_workers=None):
+        return self.map(lambda post_id: self.get(f'posts/{post_id}', metric='posts/{id}'), post_ids, max_workers)
+
+    def create_posts(self, posts, max_workers=None):
+        return self.map(lambda post: self.post('posts', json=post), posts, max_workers)
+
+    def update_posts(self, posts, max_workers=None):
+        return self.map(lambda post: self.put(f"posts/{post['id']}", json=post, metric='posts/{id}'),
+                        posts, max_workers)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def configure(base_url=None, **kwargs):
+    # Заменяет общий клиент новым с другим адресом API или параметрами
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = HttpClient(base_url or BASE_URL, **kwargs)
+        return _client
+
+
+def configure_from_argv(argv=None):
+    # Разбирает --base-url из аргументов скрипта, остальные аргументы возвращает как есть
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--base-url', default=None)
+    args, rest = parser.parse_known_args(argv)
+    if args.base_url:
+        configure(args.base_url)
+    return rest
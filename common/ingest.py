@@ -0,0 +1,118 @@
+import time
+from itertools import islice
+
+from common.instrument import span
+from common.schema import resume_fts, suspend_fts
+
+# Настоящий upsert: неизменённые строки не переписываются
+UPSERT_SQL = '''
+INSERT INTO posts (id, user_id, title, body)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    user_id = excluded.user_id,
+    title = excluded.title,
+    body = excluded.body
+WHERE posts.user_id IS NOT excluded.user_id
+   OR posts.title IS NOT excluded.title
+   OR posts.body IS NOT excluded.body
+'''
+
+BULK_LOAD_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -65536',
+    'PRAGMA temp_store = MEMORY',
+)
+
+# С какого числа записанных строк загрузка считается массовой и может отключить триггеры FTS
+FTS_BULK_ROWS = 20000
+
+
+class IngestStats:
+    def __init__(self):
+        self.rows = 0
+        self.changed = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f"{self.rows} записей, {self.batches} пачек за {self.seconds:.3f} с ({self.rows_per_second:.0f} записей/с)"
+
+
+def post_rows(posts):
+    for post in posts:
+        yield post['id'], post['userId'], post['title'], post['body']
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def apply_bulk_pragmas(conn):
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+
+
+def ingest_rows(conn, rows, batch_size=5000, batches_per_transaction=20, sql=UPSERT_SQL, progress=None,
+                fts_bulk_rows=FTS_BULK_ROWS):
+    # Строки читаются из итератора пачками, поэтому память не зависит от объёма данных
+    stats = IngestStats()
+    started = time.perf_counter()
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    # Перестроение индекса FTS обходится примерно втрое дешевле на строку, чем триггеры, но идёт
+    # по всей таблице: триггеры отключаются, когда загружено не меньше половины строк, что были до загрузки
+    existing_rows = None
+    suspended = False
+    try:
+        in_transaction = False
+        for batch in batched(rows, batch_size):
+            if not in_transaction:
+                conn.execute('BEGIN')
+                in_transaction = True
+            if not suspended and fts_bulk_rows is not None and stats.rows >= fts_bulk_rows:
+                if existing_rows is None:
+                    existing_rows = conn.execute('SELECT count(*) FROM posts').fetchone()[0] - stats.rows
+                if stats.rows * 2 >= existing_rows:
+                    suspended = suspend_fts(conn)
+            # rowcount не учитывает строки, которые upsert пропустил как неизменённые, и изменения из триггеров
+            with span('sqlite executemany', 'db', rows=len(batch)):
+                stats.changed += conn.executemany(sql, batch).rowcount
+            stats.rows += len(batch)
+            stats.batches += 1
+            if stats.batches % batches_per_transaction == 0:
+                conn.execute('COMMIT')
+                in_transaction = False
+            if progress is not None:
+                progress(stats)
+        if in_transaction:
+            conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        try:
+            if suspended:
+                # И после ошибки: закоммиченные пачки уже в таблице, индекс должен их видеть
+                with span('sqlite fts rebuild', 'db'):
+                    resume_fts(conn)
+        finally:
+            conn.isolation_level = isolation_level
+            stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def ingest_posts(conn, posts, batch_size=5000, batches_per_transaction=20, pragmas=True, progress=None):
+    if pragmas:
+        apply_bulk_pragmas(conn)
+    return ingest_rows(conn, post_rows(posts), batch_size, batches_per_transaction, progress=progress)
@@ -0,0 +1,293 @@
+import argparse
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Замеры горячих мест: сеть, SQLite, GUI. По умолчанию выключены, тогда timed/span стоят одну проверку флага.
+# Включаются переменными окружения или флагами скрипта:
+#   LAB_TRACE=trace.json / --trace trace.json - записать трассу для chrome://tracing (Perfetto) и гистограммы
+#   LAB_PROFILE=cprofile,tracemalloc / --profile ... - дополнительно профилировщики, итог рядом с трассой
+TRACE_ENV = 'LAB_TRACE'
+PROFILE_ENV = 'LAB_PROFILE'
+PROFILERS = ('cprofile', 'tracemalloc')
+
+# Больше событий трасса не хранит, гистограммы продолжают считаться
+MAX_EVENTS = 200000
+
+
+# Гистограмма длительностей в микросекундах: 4 корзины на каждую степень двойки,
+# ошибка процентилей не больше 25% при любой длительности и постоянной памяти
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = {}
+
+    @staticmethod
+    def bucket(us):
+        if us < 8:
+            return us
+        shift = us.bit_length() - 3
+        return shift * 8 + (us >> shift)
+
+    @staticmethod
+    def upper_bound(bucket):
+        if bucket < 8:
+            return bucket
+        shift, mantissa = divmod(bucket, 8)
+        return ((mantissa + 1) << shift) - 1
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        bucket = self.bucket(int(seconds * 1e6))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        rank = max(1, int(fraction * self.count + 0.5))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.upper_bound(bucket) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+        return {
+            'count': self.count,
+            'total_ms': ms(self.total),
+            'mean_ms': ms(self.total / self.count) if self.count else None,
+            'min_ms': ms(self.min),
+            'p50_ms': ms(self.percentile(0.5)),
+            'p90_ms': ms(self.percentile(0.9)),
+            'p99_ms': ms(self.percentile(0.99)),
+            'max_ms': ms(self.max),
+        }
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_ns = time.perf_counter_ns()
+        self.histograms = {}
+        self.events = []
+        self.dropped = 0
+
+    def record(self, name, category, start_ns, end_ns, args=None):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add((end_ns - start_ns) / 1e9)
+            if len(self.events) < MAX_EVENTS:
+                # Формат Trace Event: полное событие "X", время в микросекундах
+                event = {'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(),
+                         'tid': threading.get_ident(), 'ts': (start_ns - self.started_ns) / 1000,
+                         'dur': (end_ns - start_ns) / 1000}
+                if args:
+                    event['args'] = args
+                self.events.append(event)
+            else:
+                self.dropped += 1
+
+    def summary(self):
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+
+    def export(self, path):
+        summary = self.summary()
+        with self._lock:
+            thread_names = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': thread.ident,
+                             'args': {'name': thread.name}} for thread in threading.enumerate()]
+            document = {
+                'traceEvents': thread_names + self.events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'histograms': summary, 'dropped_events': self.dropped},
+            }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+        os.replace(tmp_path, path)
+
+
+_recorder = None
+_trace_path = None
+_profilers = {}
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start_ns')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        recorder = _recorder
+        if recorder is not None:
+            recorder.record(self.name, self.category, self.start_ns, time.perf_counter_ns(), self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enabled():
+    return _recorder is not None
+
+
+def span(name, category='app', **args):
+    # with span('sqlite search'): ... - выключенный замер возвращает общий пустой контекст
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def timed(name=None, category='app'):
+    # Декоратор: @timed() или @timed('fetch_posts', 'network')
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder = _recorder
+                if recorder is not None:
+                    recorder.record(label, category, start_ns, time.perf_counter_ns())
+        return wrapper
+    return decorate
+
+
+def wrap_method(obj, attribute, name, category='app'):
+    # Замер метода чужого объекта, например canvas.draw у matplotlib
+    setattr(obj, attribute, timed(name, category)(getattr(obj, attribute)))
+
+
+def summary():
+    return _recorder.summary() if _recorder is not None else {}
+
+
+def report():
+    lines = []
+    for name, stats in summary().items():
+        lines.append(f"{name:<40} {stats['count']:>7} раз, сумма {stats['total_ms']:>10.1f} мс, "
+                     f"p50 {stats['p50_ms']:.3f}, p99 {stats['p99_ms']:.3f}, max {stats['max_ms']:.3f} мс")
+    return '\n'.join(lines)
+
+
+def enable(trace_path=None, profile=()):
+    # trace_path - куда записать трассу при выходе; без него итог печатается в stderr
+    global _recorder, _trace_path
+    if _recorder is None:
+        _recorder = Recorder()
+        atexit.register(finish)
+    _trace_path = trace_path or _trace_path
+    for kind in profile:
+        if kind not in PROFILERS:
+            raise ValueError(f"Неизвестный профилировщик: {kind}")
+        if kind in _profilers:
+            continue
+        if kind == 'cprofile':
+            import cProfile
+            # cProfile видит только поток, в котором включён, - обычно главный поток GUI
+            profiler = _profilers[kind] = cProfile.Profile()
+            profiler.enable()
+        else:
+            import tracemalloc
+            tracemalloc.start(10)
+            _profilers[kind] = tracemalloc
+
+
+def disable():
+    global _recorder
+    _recorder = None
+
+
+def output_path(suffix):
+    base = os.path.splitext(_trace_path)[0] if _trace_path else 'lab-profile'
+    return base + suffix
+
+
+def finish():
+    # Вызывается при выходе: трасса, профили и сводка
+    recorder = _recorder
+    if recorder is None:
+        return
+    profiler = _profilers.pop('cprofile', None)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(output_path('.prof'))
+        print(f"Профиль cProfile: {output_path('.prof')} (python -m pstats)", file=sys.stderr)
+    tracemalloc = _profilers.pop('tracemalloc', None)
+    if tracemalloc is not None:
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with open(output_path('.tracemalloc.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"Пик отслеживаемой памяти: {peak / 1024 / 1024:.1f} МБ\n")
+            for stat in snapshot.statistics('lineno')[:30]:
+                f.write(f"{stat}\n")
+        print(f"Память tracemalloc: {output_path('.tracemalloc.txt')}", file=sys.stderr)
+    if _trace_path:
+        recorder.export(_trace_path)
+        print(f"Трасса: {_trace_path} (chrome://tracing или ui.perfetto.dev)", file=sys.stderr)
+    text = report()
+    if text:
+        print(text, file=sys.stderr)
+
+
+def profile_kinds(value):
+    return [kind.strip() for kind in (value or '').split(',') if kind.strip()]
+
+
+def enable_from_env():
+    trace_path = os.environ.get(TRACE_ENV)
+    profile = profile_kinds(os.environ.get(PROFILE_ENV))
+    if trace_path or profile:
+        enable(trace_path, profile)
+
+
+def enable_from_argv(argv=None):
+    # Разбирает --trace и --profile из аргументов скрипта, остальные возвращает как есть
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--trace', default=None)
+    parser.add_argument('--profile', default=None)
+    args, rest = parser.parse_known_args(argv)
+    if args.trace or args.profile:
+        enable(args.trace, profile_kinds(args.profile))
+    return rest
+
+
+enable_from_env()
@@ -0,0 +1,76 @@
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+# Разбор JSON массива по мере прихода байтов: элементы отдаются, как только они целиком получены
+def iter_json_array(chunks):
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    started = False
+    finished = False
+    chunks = iter(chunks)
+
+    def more():
+        nonlocal buffer, pos
+        chunk = next(chunks, None)
+        if chunk is None:
+            buffer = buffer[pos:] + text_decoder.decode(b'', final=True)
+            pos = 0
+            return False
+        # Отбрасываем уже разобранную часть, чтобы буфер не рос вместе с ответом
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        return True
+
+    eof = False
+    while not finished:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Ответ оборвался до конца JSON массива")
+            eof = not more()
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise ValueError("Ожидался JSON массив")
+            started = True
+            pos += 1
+            expect_value = True
+            continue
+        if char == ']':
+            finished = True
+            pos += 1
+            continue
+        if char == ',' and not expect_value:
+            expect_value = True
+            pos += 1
+            continue
+
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            eof = not more()
+            continue
+        if end == len(buffer) and not isinstance(value, (dict, list)) and not eof:
+            # Число или литерал на границе чанка может оказаться неполным
+            eof = not more()
+            continue
+        pos = end
+        expect_value = False
+        yield value
+
+    # Дочитываем ответ до конца: источник (например, запись в кэш) должен увидеть весь поток
+    while True:
+        if buffer[pos:].strip(_WHITESPACE):
+            raise ValueError("Лишние данные после JSON массива")
+        if eof or not more():
+            return
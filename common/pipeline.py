@@ -0,0 +1,204 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common.http_client import get_client
+from common.repository import get_repository
+
+# Конец потока данных между стадиями
+DONE = object()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+def decode_page(raw):
+    # Выполняется в процессе-обработчике: разбор JSON и сборка строк для вставки
+    return [(post['id'], post['userId'], post['title'], post['body']) for post in json.loads(raw)]
+
+
+class PipelineStats:
+    def __init__(self):
+        self.pages = 0
+        self.bytes = 0
+        self.rows = 0
+        self.changed = 0
+        self.seconds = 0.0
+        # Суммарное время работы каждой стадии без ожидания очередей: видно, какая из них узкое место
+        self.fetch_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.write_seconds = 0.0
+        self.write_wait = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.rows} записей, {self.pages} страниц, {self.bytes / 1024 / 1024:.1f} МБ за "
+                f"{self.seconds:.3f} с ({self.rows_per_second:.0f} записей/с; загрузка {self.fetch_seconds:.2f} с, "
+                f"разбор {self.decode_seconds:.2f} с, запись {self.write_seconds:.2f} с)")
+
+
+# Загрузка постов конвейером: страницы (?_start=&_limit=) скачиваются параллельно, JSON разбирается
+# в пуле процессов, в SQLite пишет один поток - вызывающий. Между стадиями ограниченные очереди:
+# если запись отстаёт, разбор и скачивание ждут, поэтому память не зависит от объёма данных
+class PipelineIngest:
+    def __init__(self, db_path='posts.db', path='posts', client=None, page_size=1000, fetch_workers=4,
+                 decode_processes=None, queue_size=8, batch_size=5000, batches_per_transaction=20):
+        self.db_path = db_path
+        self.path = path
+        self.client = client
+        self.page_size = page_size
+        self.fetch_workers = fetch_workers
+        # По умолчанию одно ядро остаётся писателю; 0 - разбор в потоке этого процесса, без пула
+        if decode_processes is None:
+            decode_processes = max(0, (os.cpu_count() or 1) - 1)
+        self.decode_processes = decode_processes
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batches_per_transaction = batches_per_transaction
+
+    def run(self, progress=None, interrupted=None):
+        self.stats = PipelineStats()
+        self.stop = threading.Event()
+        self.errors = []
+        self._lock = threading.Lock()
+        self.next_page = 0
+        self.last_page = None
+        self.raw_pages = queue.Queue(self.queue_size)
+        self.decoded = queue.Queue(self.queue_size)
+
+        decoders = max(1, self.decode_processes)
+        # spawn, а не fork: процессы пула создаются, когда потоки стадий уже работают, и fork
+        # скопировал бы в них захваченные этими потоками блокировки
+        pool = (ProcessPoolExecutor(self.decode_processes, mp_context=multiprocessing.get_context('spawn'))
+                if self.decode_processes else None)
+        fetchers = [threading.Thread(target=self._fetch_worker, daemon=True) for _ in range(self.fetch_workers)]
+        decoder_threads = [threading.Thread(target=self._decode_worker, args=(pool,), daemon=True)
+                           for _ in range(decoders)]
+        self.remaining = {'fetch': len(fetchers), 'decode': len(decoder_threads)}
+
+        started = time.perf_counter()
+        for thread in fetchers + decoder_threads:
+            thread.start()
+        try:
+            stats = get_repository(self.db_path).save_rows(
+                self._rows(progress, interrupted), batch_size=self.batch_size,
+                batches_per_transaction=self.batches_per_transaction)
+            self.stats.changed = stats.changed
+        except PipelineStopped:
+            if self.errors:
+                raise self.errors[0]
+            raise
+        finally:
+            self.stop.set()
+            for thread in fetchers + decoder_threads:
+                thread.join()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            self.stats.seconds = time.perf_counter() - started
+            self.stats.write_seconds = self.stats.seconds - self.stats.write_wait
+        if self.errors:
+            raise self.errors[0]
+        return self.stats
+
+    def _put(self, target, item):
+        while not self.stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise PipelineStopped()
+
+    def _get(self, source):
+        while not self.stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        raise PipelineStopped()
+
+    def _stage(self, name, work, on_finish):
+        # Общая обвязка потока стадии: первая ошибка останавливает весь конвейер,
+        # последний завершившийся поток стадии передаёт конец данных следующей
+        try:
+            work()
+            with self._lock:
+                self.remaining[name] -= 1
+                last = self.remaining[name] == 0
+            if last:
+                on_finish()
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            with self._lock:
+                self.errors.append(e)
+            self.stop.set()
+
+    def _fetch_worker(self):
+        def work():
+            client = self.client or get_client()
+            while True:
+                with self._lock:
+                    page = self.next_page
+                    self.next_page += 1
+                    if self.last_page is not None and page > self.last_page:
+                        return
+                started = time.perf_counter()
+                response = client.get(self.path, params={'_start': page * self.page_size, '_limit': self.page_size},
+                                      metric=f'{self.path}?_start')
+                response.raise_for_status()
+                body = response.content
+                with self._lock:
+                    self.stats.fetch_seconds += time.perf_counter() - started
+                # Пустая страница - данные кончились, страницы дальше неё не запрашиваются
+                if not body.strip(b' \r\n\t[]'):
+                    with self._lock:
+                        if self.last_page is None or page < self.last_page:
+                            self.last_page = page
+                    return
+                with self._lock:
+                    self.stats.pages += 1
+                    self.stats.bytes += len(body)
+                self._put(self.raw_pages, body)
+
+        def finish():
+            for _ in range(self.remaining['decode']):
+                self._put(self.raw_pages, DONE)
+
+        self._stage('fetch', work, finish)
+
+    def _decode_worker(self, pool):
+        def work():
+            while True:
+                raw = self._get(self.raw_pages)
+                if raw is DONE:
+                    return
+                started = time.perf_counter()
+                rows = pool.submit(decode_page, raw).result() if pool is not None else decode_page(raw)
+                with self._lock:
+                    self.stats.decode_seconds += time.perf_counter() - started
+                self._put(self.decoded, rows)
+
+        self._stage('decode', work, lambda: self._put(self.decoded, DONE))
+
+    def _rows(self, progress, interrupted):
+        while True:
+            if interrupted is not None and interrupted():
+                raise PipelineStopped()
+            started = time.perf_counter()
+            rows = self._get(self.decoded)
+            self.stats.write_wait += time.perf_counter() - started
+            if rows is DONE:
+                return
+            self.stats.rows += len(rows)
+            yield from rows
+            if progress is not None:
+                progress(self.stats)
@@ -0,0 +1,375 @@
+import sqlite3
+from collections import OrderedDict
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QObject, Qt, QThread, QTimer, pyqtSignal
+
+from common.db import get_manager
+from common.deletes import last_delete
+from common.instrument import span
+from common.queries import POST_COLUMNS, search_posts
+
+HEADERS = ("ID", "User ID", "Title", "Body")
+
+
+# Результаты поиска, строки добавляются пачками по мере прихода
+class SearchResultsModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole) and index.isValid():
+            return self.rows[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def row_id(self, row):
+        return self.rows[row][0]
+
+    def append_rows(self, rows):
+        if not rows:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+    def remove_ids(self, ids):
+        # Соседние строки удаляются одним диапазоном, с конца, чтобы не сдвигать ещё не удалённые
+        ids = set(ids)
+        positions = [row for row, post in enumerate(self.rows) if post[0] in ids]
+        for first, last in reversed(contiguous_ranges(positions)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.rows[first:last + 1]
+            self.endRemoveRows()
+
+
+def contiguous_ranges(positions):
+    # [3, 4, 5, 9] -> [(3, 5), (9, 9)]
+    ranges = []
+    for position in positions:
+        if ranges and ranges[-1][1] == position - 1:
+            ranges[-1] = (ranges[-1][0], position)
+        else:
+            ranges.append((position, position))
+    return ranges
+
+
+# Ленивая модель всей таблицы: строки подгружаются блоками по ключу id по мере прокрутки,
+# в памяти держится ограниченное число блоков (LRU). row_count - уже посчитанное число строк,
+# например DatabaseOpenWorker, тогда модель создаётся без запроса к базе
+class LazyPostsModel(QAbstractTableModel):
+    def __init__(self, db_path, block_size=256, max_blocks=64, parent=None, row_count=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+        self.block_keys = {}
+        self.row_count = 0
+        # Больше стольких строк за раз дешевле перечитать модель целиком
+        self.incremental_limit = 256
+        if row_count is None:
+            self.refresh()
+        else:
+            self.reset(row_count)
+
+    def connection(self):
+        return get_manager(self.db_path).connection()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role not in (Qt.DisplayRole, Qt.EditRole) or not index.isValid():
+            return None
+        row = self.row(index.row())
+        return None if row is None else row[index.column()]
+
+    def row(self, row):
+        number, offset = divmod(row, self.block_size)
+        block = self.block(number)
+        return block[offset] if offset < len(block) else None
+
+    def row_id(self, row):
+        post = self.row(row)
+        return None if post is None else post[0]
+
+    def block(self, number):
+        block = self.blocks.get(number)
+        if block is not None:
+            self.blocks.move_to_end(number)
+            return block
+
+        block = self.load_block(number)
+        self.blocks[number] = block
+        if len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+        return block
+
+    def load_block(self, number):
+        # Соседний блок в кэше или известный первый id - читаем по ключу, иначе один раз через OFFSET
+        previous = self.blocks.get(number - 1)
+        if previous and len(previous) == self.block_size:
+            rows = self.fetch_block('WHERE id > ?', (previous[-1][0],))
+        elif number in self.block_keys:
+            rows = self.fetch_block('WHERE id >= ?', (self.block_keys[number],))
+        else:
+            rows = self.fetch_block('', (), offset=number * self.block_size)
+        if rows:
+            self.block_keys[number] = rows[0][0]
+        return rows
+
+    def fetch_block(self, condition, params, offset=0):
+        sql = f'SELECT {POST_COLUMNS} FROM posts {condition} ORDER BY id LIMIT ? OFFSET ?'
+        with span('sqlite block', 'db', offset=offset):
+            return self.connection().execute(sql, params + (self.block_size, offset)).fetchall()
+
+    def invalidate_from(self, row):
+        first_block = row // self.block_size
+        for number in [n for n in self.blocks if n >= first_block]:
+            del self.blocks[number]
+        for number in [n for n in self.block_keys if n >= first_block]:
+            del self.block_keys[number]
+
+    def refresh(self):
+        with span('sqlite count', 'db'):
+            row_count = self.connection().execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+        self.reset(row_count)
+
+    def reset(self, row_count):
+        self.beginResetModel()
+        self.blocks.clear()
+        self.block_keys.clear()
+        self.row_count = row_count
+        self.endResetModel()
+
+    def cached_positions(self):
+        positions = {}
+        for number, block in self.blocks.items():
+            first = number * self.block_size
+            for offset, post in enumerate(block):
+                positions[post[0]] = first + offset
+        return positions
+
+    def count_before(self, post_id):
+        # Считаем от ближайшего известного начала блока, а не от начала таблицы.
+        # Возвращает (позиция начала блока, его первый id, строк между ним и post_id сейчас)
+        number, key = 0, None
+        for block_number, block_key in self.block_keys.items():
+            if block_key <= post_id and (key is None or block_key > key):
+                number, key = block_number, block_key
+        if key is None:
+            count = self.connection().execute('SELECT COUNT(*) FROM posts WHERE id < ?', (post_id,)).fetchone()[0]
+            return 0, None, count
+        count = self.connection().execute('SELECT COUNT(*) FROM posts WHERE id >= ? AND id < ?',
+                                          (key, post_id)).fetchone()[0]
+        return number * self.block_size, key, count
+
+    def insert_ids(self, ids):
+        # Вызывается после вставки в базу: позиция новой строки - число строк с меньшим id
+        ids = sorted(set(ids))
+        if not ids:
+            return
+        if len(ids) > self.incremental_limit:
+            self.refresh()
+            return
+        positions = []
+        for post_id in ids:
+            start, key, count = self.count_before(post_id)
+            # Начало блока известно до вставки, добавляем новые строки левее него
+            shift = sum(1 for other in ids if key is not None and other < key)
+            positions.append(start + shift + count)
+        self.invalidate_from(positions[0])
+        for first, last in contiguous_ranges(positions):
+            self.beginInsertRows(QModelIndex(), first, last)
+            self.row_count += last - first + 1
+            self.endInsertRows()
+
+    def remove_ids(self, ids):
+        # Вызывается после удаления из базы: позиция в старом порядке = строки, оставшиеся между
+        # началом блока и id, плюс удалённые id из того же промежутка
+        ids = sorted(set(ids))
+        if not ids:
+            return
+        if len(ids) > self.incremental_limit:
+            self.refresh()
+            return
+        cached = self.cached_positions()
+        positions = []
+        for post_id in ids:
+            position = cached.get(post_id)
+            if position is None:
+                start, key, count = self.count_before(post_id)
+                removed = sum(1 for other in ids if (key is None or other >= key) and other < post_id)
+                position = start + count + removed
+            positions.append(position)
+        positions = sorted(p for p in positions if p < self.row_count)
+        if not positions:
+            return
+        self.invalidate_from(positions[0])
+        for first, last in reversed(contiguous_ranges(positions)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self.row_count -= last - first + 1
+            self.endRemoveRows()
+
+
+# Открытие базы после первой отрисовки окна: initialize (миграции, начальные данные) и подсчёт строк
+# идут в своём потоке, initialize работает с соединением get_manager(db_path) этого потока
+class DatabaseOpenWorker(QThread):
+    opened = pyqtSignal(int, bool)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_path, initialize=None):
+        super().__init__()
+        self.db_path = db_path
+        self.initialize = initialize
+
+    def run(self):
+        manager = get_manager(self.db_path)
+        try:
+            if self.initialize is not None:
+                self.initialize()
+            connection = manager.connection()
+            with span('sqlite count', 'db'):
+                row_count = connection.execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+            can_undo = last_delete(connection) is not None
+        except sqlite3.Error as e:
+            self.failed.emit(str(e))
+            return
+        finally:
+            manager.close_thread()
+        self.opened.emit(row_count, can_undo)
+
+
+# Поиск в своём потоке и со своим соединением, результаты отдаются пачками
+class SearchWorker(QThread):
+    batch_ready = pyqtSignal(int, list)
+    search_done = pyqtSignal(int, int)
+
+    def __init__(self, db_path, text, field, generation, batch_size=500):
+        super().__init__()
+        self.db_path = db_path
+        self.text = text
+        self.field = field
+        self.generation = generation
+        self.batch_size = batch_size
+        self.connection = None
+
+    def run(self):
+        manager = get_manager(self.db_path)
+        total = 0
+        try:
+            self.connection = manager.connection()
+            with span('sqlite search', 'db', text=self.text):
+                cursor = search_posts(self.connection, self.text, self.field)
+                while not self.isInterruptionRequested():
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    total += len(rows)
+                    self.batch_ready.emit(self.generation, rows)
+                cursor.close()
+        except sqlite3.OperationalError:
+            # Запрос прерван через cancel() или база занята - результат всё равно устарел
+            pass
+        finally:
+            self.connection = None
+            manager.close_thread()
+        self.search_done.emit(self.generation, total)
+
+    def cancel(self):
+        self.requestInterruption()
+        connection = self.connection
+        if connection is not None:
+            try:
+                connection.interrupt()
+            except sqlite3.ProgrammingError:
+                pass
+
+
+# Поиск с задержкой: запрос уходит, когда пользователь перестал печатать, старый при этом отменяется
+class DebouncedSearch(QObject):
+    search_started = pyqtSignal(str)
+    search_finished = pyqtSignal(str, int)
+
+    def __init__(self, db_path, model, field=None, delay=250, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.model = model
+        self.field = field
+        self.text = ""
+        self.generation = 0
+        self.workers = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.run_now)
+
+    def set_text(self, text):
+        self.text = text
+        self.generation += 1
+        self.cancel()
+        self.timer.start()
+
+    def run_now(self):
+        self.timer.stop()
+        self.generation += 1
+        self.cancel()
+        self.model.clear()
+        if not self.text:
+            return
+
+        worker = SearchWorker(self.db_path, self.text, self.field, self.generation)
+        worker.batch_ready.connect(self.on_batch)
+        worker.search_done.connect(self.on_done)
+        worker.finished.connect(lambda: self.forget(worker))
+        self.workers.add(worker)
+        self.search_started.emit(self.text)
+        worker.start()
+
+    def on_batch(self, generation, rows):
+        if generation == self.generation:
+            self.model.append_rows(rows)
+
+    def on_done(self, generation, total):
+        if generation == self.generation:
+            self.search_finished.emit(self.text, total)
+
+    def forget(self, worker):
+        # finished приходит из самого потока, дожидаемся его полного завершения перед удалением объекта
+        worker.wait()
+        self.workers.discard(worker)
+
+    def cancel(self):
+        for worker in self.workers:
+            worker.cancel()
+
+    def shutdown(self):
+        self.timer.stop()
+        self.cancel()
+        for worker in list(self.workers):
+            worker.wait()
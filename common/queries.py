@@ -0,0 +1,65 @@
+from common.db import fold_case
+
+POST_COLUMNS = 'id, user_id, title, body'
+
+SEARCH_FIELDS = ('title', 'body')
+
+# Поля в полнотекстовом индексе posts_fts, остальные ищутся через LIKE
+FTS_FIELDS = ('title',)
+
+# Триграммному индексу нужно минимум 3 символа, короче - LIKE со свёрткой регистра fold_case
+# (функция регистрируется в common/db.py), чтобы регистр не учитывался одинаково в обоих случаях
+MIN_FTS_LENGTH = 3
+
+
+def posts_by_user(conn, user_id):
+    return conn.execute(f'SELECT {POST_COLUMNS} FROM posts WHERE user_id = ? ORDER BY id', (user_id,)).fetchall()
+
+
+def post_by_id(conn, post_id):
+    return conn.execute(f'SELECT {POST_COLUMNS} FROM posts WHERE id = ?', (post_id,)).fetchone()
+
+
+def fts_expression(text, field=None):
+    # Строка поиска как одна фраза: кавычки внутри удваиваются по правилам FTS5
+    phrase = '"' + text.replace('"', '""') + '"'
+    if field is None:
+        return phrase
+    if field not in SEARCH_FIELDS:
+        raise ValueError(f"Неизвестное поле поиска: {field}")
+    return f'{field} : {phrase}'
+
+
+def like_pattern(text):
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def search_clause(text, field=None):
+    # Возвращает (условие WHERE, параметры) для поиска по подстроке в title/body без учёта регистра
+    fields = (field,) if field else SEARCH_FIELDS
+    conditions = []
+    params = ()
+    for name in fields:
+        if name in FTS_FIELDS and len(text) >= MIN_FTS_LENGTH:
+            conditions.append('id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)')
+            params += (fts_expression(text, name),)
+        elif name in SEARCH_FIELDS:
+            conditions.append(f"fold_case({name}) LIKE ? ESCAPE '\\'")
+            params += (like_pattern(fold_case(text)),)
+        else:
+            raise ValueError(f"Неизвестное поле поиска: {field}")
+    return f"({' OR '.join(conditions)})", params
+
+
+def search_posts(conn, text, field=None, limit=None, offset=0):
+    if not text:
+        sql, params = f'SELECT {POST_COLUMNS} FROM posts', ()
+    else:
+        where, params = search_clause(text, field)
+        sql = f'SELECT {POST_COLUMNS} FROM posts WHERE {where}'
+    sql += ' ORDER BY id'
+    if limit is not None:
+        sql += ' LIMIT ? OFFSET ?'
+        params += (limit, offset)
+    return conn.execute(sql, params)
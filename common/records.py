@@ -0,0 +1,157 @@
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Один пост: слоты вместо словаря из JSON, в несколько раз меньше памяти
+class Post:
+    __slots__ = ('id', 'user_id', 'title', 'body')
+
+    def __init__(self, id, user_id, title, body):
+        self.id = id
+        self.user_id = user_id
+        self.title = title
+        self.body = body
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['id'], data['userId'], data['title'], data['body'])
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def to_json(self):
+        return {'userId': self.user_id, 'id': self.id, 'title': self.title, 'body': self.body}
+
+    def as_tuple(self):
+        return self.id, self.user_id, self.title, self.body
+
+    def __eq__(self, other):
+        return isinstance(other, Post) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self):
+        return f'Post(id={self.id}, user_id={self.user_id}, title={self.title!r})'
+
+
+# Набор постов по столбцам: id и user_id в массивах int64, заголовки интернированы (они часто
+# повторяются, тела почти всегда уникальны). С NumPy строки собранного набора хранятся массивами
+# объектов, и where() выбирает их одной индексацией. Фильтры возвращают маску (массив NumPy,
+# без него - список) и применяются через where()
+class PostBatch:
+    def __init__(self):
+        self.ids = array('q')
+        self.user_ids = array('q')
+        self.titles = []
+        self.bodies = []
+
+    @classmethod
+    def from_json(cls, posts):
+        # По столбцам: четыре прохода включениями списков быстрее, чем разбор поста за постом
+        posts = posts if isinstance(posts, list) else list(posts)
+        intern = sys.intern
+        batch = cls()
+        batch.ids = array('q', [post['id'] for post in posts])
+        batch.user_ids = array('q', [post['userId'] for post in posts])
+        batch.titles = [intern(post['title']) for post in posts]
+        batch.bodies = [post['body'] for post in posts]
+        batch.seal()
+        return batch
+
+    @classmethod
+    def from_rows(cls, rows):
+        batch = cls()
+        # Без вызова append на каждую строку: сборка миллиона постов - основная цена набора
+        add_id = batch.ids.append
+        add_user_id = batch.user_ids.append
+        add_title = batch.titles.append
+        add_body = batch.bodies.append
+        intern = sys.intern
+        for id, user_id, title, body in rows:
+            add_id(id)
+            add_user_id(user_id)
+            add_title(intern(title) if title is not None else None)
+            add_body(body)
+        batch.seal()
+        return batch
+
+    def seal(self):
+        # Списки строк - в массивы объектов NumPy: те же ссылки на строки, но выборка без цикла Python
+        if np is not None:
+            self.titles = self.object_column(self.titles)
+            self.bodies = self.object_column(self.bodies)
+
+    @staticmethod
+    def object_column(values):
+        if isinstance(values, np.ndarray):
+            return values
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+
+    def append(self, id, user_id, title, body):
+        if not isinstance(self.titles, list):
+            # После seal() массив объектов не растёт: до следующей выборки строки снова в списках
+            self.titles = self.titles.tolist()
+            self.bodies = self.bodies.tolist()
+        self.ids.append(id)
+        self.user_ids.append(user_id)
+        self.titles.append(sys.intern(title) if title is not None else None)
+        self.bodies.append(body)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return Post(self.ids[index], self.user_ids[index], self.titles[index], self.bodies[index])
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self[index]
+
+    def rows(self):
+        # Кортежи для common.ingest.ingest_rows
+        return zip(self.ids, self.user_ids, self.titles, self.bodies)
+
+    def column(self, values):
+        # Представление массива без копирования; не хранить: пока оно живо, array нельзя расширять
+        return np.frombuffer(values, dtype=np.int64) if len(values) else np.empty(0, dtype=np.int64)
+
+    def even_user(self):
+        if np is None:
+            return [user_id % 2 == 0 for user_id in self.user_ids]
+        return self.column(self.user_ids) % 2 == 0
+
+    def user_in(self, user_ids):
+        if np is None:
+            user_ids = set(user_ids)
+            return [user_id in user_ids for user_id in self.user_ids]
+        return np.isin(self.column(self.user_ids), list(user_ids))
+
+    def id_range(self, low, high):
+        # Полуинтервал [low, high)
+        if np is None:
+            return [low <= post_id < high for post_id in self.ids]
+        ids = self.column(self.ids)
+        return (ids >= low) & (ids < high)
+
+    def where(self, mask):
+        batch = PostBatch()
+        if np is None:
+            positions = [index for index, keep in enumerate(mask) if keep]
+            batch.ids = array('q', (self.ids[index] for index in positions))
+            batch.user_ids = array('q', (self.user_ids[index] for index in positions))
+            batch.titles = [self.titles[index] for index in positions]
+            batch.bodies = [self.bodies[index] for index in positions]
+            return batch
+        selected = np.flatnonzero(mask)
+        batch.ids.frombytes(self.column(self.ids)[selected].tobytes())
+        batch.user_ids.frombytes(self.column(self.user_ids)[selected].tobytes())
+        self.seal()
+        batch.titles = self.titles[selected]
+        batch.bodies = self.bodies[selected]
+        return batch
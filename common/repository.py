@@ -0,0 +1,245 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from common.db import DEFAULT_DB_PATH, get_manager
+from common.deletes import MAX_PARAMS, delete_posts, placeholders, undo_delete
+from common.instrument import span
+from common.ingest import apply_bulk_pragmas, batched, ingest_rows, post_rows
+from common.queries import post_by_id, posts_by_user, search_posts
+
+# Больше стольких записанных постов точечная инвалидация дороже, чем сброс всего кэша
+PRECISE_INVALIDATION_LIMIT = 10000
+
+
+# Кэш результатов запросов: LRU по числу записей и TTL на случай записи в базу из другого процесса.
+# Для каждой записи помнится, какие id в ней есть, чтобы при записи сбрасывать только затронутые
+class QueryCache:
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys_by_id = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Растёт при каждом сбросе: результат, прочитанный до записи, не попадёт в кэш после неё
+        self.generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, ids, generation=None):
+        # generation - значение self.generation до чтения value; если с тех пор была запись, value
+        # может быть устаревшим, и он не кэшируется
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (value, time.monotonic(), ids)
+            for post_id in ids:
+                self.keys_by_id[post_id].add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+            return True
+
+    def _drop(self, key):
+        _, _, ids = self.entries.pop(key)
+        for post_id in ids:
+            keys = self.keys_by_id.get(post_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_id[post_id]
+
+    def invalidate(self, keys=(), ids=(), kinds=()):
+        # keys - конкретные ключи, ids - все записи с этими постами, kinds - все записи данного вида
+        with self._lock:
+            self.generation += 1
+            targets = set(key for key in keys if key in self.entries)
+            for post_id in ids:
+                targets.update(self.keys_by_id.get(post_id, ()))
+            if kinds:
+                targets.update(key for key in self.entries if key[0] in kinds)
+            for key in targets:
+                self._drop(key)
+            self.invalidations += len(targets)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.keys_by_id.clear()
+
+    def metrics(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'entries': len(self.entries),
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# Доступ к posts.db через кэш: чтения по пользователю, id и поиску кэшируются,
+# запись через репозиторий сбрасывает только затронутые записи кэша
+class PostsRepository:
+    def __init__(self, path=DEFAULT_DB_PATH, max_entries=1024, ttl=300):
+        self.manager = get_manager(path)
+        self.cache = QueryCache(max_entries, ttl)
+        self.snapshot = None
+
+    def connection(self):
+        return self.manager.connection()
+
+    def use_snapshot(self, path):
+        # Чтения by_id/by_user/search идут из снимка common/snapshot.py через mmap, а не из SQLite.
+        # Снимок должен совпадать с базой (например, только что записан export_snapshot);
+        # первая запись через репозиторий его отключает
+        from common.snapshot import PostSnapshot
+        snapshot = PostSnapshot(path)
+        self.detach_snapshot()
+        self.snapshot = snapshot
+        self.cache.clear()
+
+    def detach_snapshot(self):
+        snapshot, self.snapshot = self.snapshot, None
+        if snapshot is not None:
+            snapshot.close()
+
+    def cached(self, key, load):
+        # Списки строк хранятся кортежами, чтобы вызывающий код не мог изменить закэшированное
+        hit, rows = self.cache.get(key)
+        if hit:
+            return rows
+        generation = self.cache.generation
+        with span(f'sqlite {key[0]}', 'db'):
+            rows = tuple(load())
+        self.cache.put(key, rows, [row[0] for row in rows], generation)
+        return rows
+
+    def by_user(self, user_id):
+        if self.snapshot is not None:
+            return tuple(self.snapshot.by_user(user_id))
+        return self.cached(('user', user_id), lambda: posts_by_user(self.connection(), user_id))
+
+    def by_id(self, post_id):
+        if self.snapshot is not None:
+            return self.snapshot.by_id(post_id)
+
+        def load():
+            row = post_by_id(self.connection(), post_id)
+            return [row] if row else []
+        rows = self.cached(('id', post_id), load)
+        return rows[0] if rows else None
+
+    def search(self, text, field=None, limit=None):
+        if self.snapshot is not None:
+            return tuple(self.snapshot.search(text, field, limit))
+        return self.cached(('search', text, field, limit),
+                           lambda: search_posts(self.connection(), text, field, limit).fetchall())
+
+    def written(self, pairs):
+        # pairs - (id, user_id) записанных постов; новая строка может подойти под любой поиск
+        ids = set()
+        keys = set()
+        for post_id, user_id in pairs:
+            ids.add(post_id)
+            keys.add(('id', post_id))
+            keys.add(('user', user_id))
+        self.cache.invalidate(keys=keys, ids=ids, kinds=('search',))
+
+    def save(self, posts, **kwargs):
+        return self.save_rows(post_rows(posts), **kwargs)
+
+    def save_rows(self, rows, pragmas=True, **kwargs):
+        # rows - кортежи (id, user_id, title, body), может быть генератором:
+        # id запоминаются по ходу записи, пока их немного
+        written = []
+        overflow = False
+
+        def track(items):
+            nonlocal overflow
+            for row in items:
+                if not overflow:
+                    if len(written) < PRECISE_INVALIDATION_LIMIT:
+                        written.append((row[0], row[1]))
+                    else:
+                        overflow = True
+                        written.clear()
+                yield row
+
+        connection = self.connection()
+        if pragmas:
+            apply_bulk_pragmas(connection)
+        self.detach_snapshot()
+        try:
+            return ingest_rows(connection, track(rows), **kwargs)
+        finally:
+            if overflow:
+                self.cache.clear()
+            else:
+                self.written(written)
+
+    def add(self, user_id, title, body):
+        self.detach_snapshot()
+        with self.manager.transaction() as connection:
+            post_id = connection.execute('INSERT INTO posts (user_id, title, body) VALUES (?, ?, ?)',
+                                         (user_id, title, body)).lastrowid
+        self.written([(post_id, user_id)])
+        return post_id
+
+    def delete(self, ids):
+        ids = [post_id for post_id in ids if post_id is not None]
+        self.detach_snapshot()
+        try:
+            return delete_posts(self.connection(), ids)
+        finally:
+            # Удаление не добавляет строк, поиск по остальным записям остаётся верным
+            self.cache.invalidate(keys=[('id', post_id) for post_id in ids], ids=ids)
+
+    def undo_delete(self):
+        self.detach_snapshot()
+        ids = undo_delete(self.connection())
+        if len(ids) > PRECISE_INVALIDATION_LIMIT:
+            self.cache.clear()
+        elif ids:
+            rows = []
+            for chunk in batched(ids, MAX_PARAMS):
+                rows += self.connection().execute(
+                    f'SELECT id, user_id FROM posts WHERE id IN ({placeholders(len(chunk))})', chunk).fetchall()
+            self.written(rows)
+        return ids
+
+    def metrics(self):
+        return self.cache.metrics()
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(path=DEFAULT_DB_PATH):
+    key = get_manager(path).path
+    with _repositories_lock:
+        repository = _repositories.get(key)
+        if repository is None:
+            repository = _repositories[key] = PostsRepository(path)
+        return repository
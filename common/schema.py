@@ -0,0 +1,139 @@
+import sqlite3
+
+# Триггеры, которые держат полнотекстовый индекс posts_fts (только title) в согласии с таблицей posts.
+# Правка одного body индекс не трогает
+FTS_TRIGGERS = {
+    'posts_fts_insert': '''
+    CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+    ''',
+    'posts_fts_delete': '''
+    CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END;
+    ''',
+    'posts_fts_update': '''
+    CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF id, title ON posts
+    WHEN old.id IS NOT new.id OR old.title IS NOT new.title BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO posts_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+    ''',
+}
+
+FTS_RESTORE = ''.join(FTS_TRIGGERS.values()) + '''
+    INSERT INTO posts_fts (posts_fts) VALUES ('rebuild');
+'''
+
+# Миграции схемы posts.db, номер применённой хранится в PRAGMA user_version
+MIGRATIONS = [
+    (1, '''
+    CREATE TABLE IF NOT EXISTS posts (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        title TEXT,
+        body TEXT
+    );
+    '''),
+    (2, '''
+    CREATE INDEX IF NOT EXISTS idx_posts_user_id ON posts (user_id);
+    '''),
+    # Полнотекстовый индекс по title/body. Токенизатор trigram ищет по подстроке, как LIKE '%text%',
+    # но через индекс. Триггеры держат его в согласии с таблицей при любых вставках, правках и удалениях.
+    (3, '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, body, content='posts', content_rowid='id', tokenize='trigram'
+    );
+    CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+    END;
+    CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END;
+    CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO posts_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+    END;
+    INSERT INTO posts_fts (posts_fts) VALUES ('rebuild');
+    '''),
+    # Журнал удалений для отмены: удалённые строки хранятся по номеру пачки
+    (4, '''
+    CREATE TABLE IF NOT EXISTS delete_batches (
+        id INTEGER PRIMARY KEY,
+        deleted_at REAL,
+        count INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS deleted_posts (
+        batch_id INTEGER NOT NULL,
+        id INTEGER,
+        user_id INTEGER,
+        title TEXT,
+        body TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_deleted_posts_batch_id ON deleted_posts (batch_id);
+    '''),
+    # Триграммы всего body делали каждую вставку в десятки раз дороже, а ищут лабы только по title:
+    # индекс теперь только по title, поиск по body - LIKE (см. common/queries.py)
+    (5, '''
+    DROP TRIGGER IF EXISTS posts_fts_insert;
+    DROP TRIGGER IF EXISTS posts_fts_delete;
+    DROP TRIGGER IF EXISTS posts_fts_update;
+    DROP TABLE IF EXISTS posts_fts;
+    CREATE VIRTUAL TABLE posts_fts USING fts5(
+        title, content='posts', content_rowid='id', tokenize='trigram'
+    );
+    ''' + FTS_RESTORE),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_script(conn, script):
+    # executescript сам завершает открытую транзакцию, скрипт идёт в своей
+    try:
+        conn.executescript(f'BEGIN;\n{script}\nCOMMIT;')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'").fetchone() is not None
+
+
+def fts_suspended(conn):
+    names = ', '.join('?' * len(FTS_TRIGGERS))
+    count = conn.execute(f"SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({names})",
+                         tuple(FTS_TRIGGERS)).fetchone()[0]
+    return count < len(FTS_TRIGGERS) and has_fts(conn)
+
+
+def suspend_fts(conn):
+    # Для массовой загрузки: триггеры обновляют индекс построчно, это в разы дольше,
+    # чем перестроить его один раз в конце (resume_fts). Вызывается внутри транзакции загрузки
+    if not has_fts(conn):
+        return False
+    for name in FTS_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    return True
+
+
+def resume_fts(conn):
+    run_script(conn, FTS_RESTORE)
+
+
+def migrate(conn):
+    version = schema_version(conn)
+    for number, script in MIGRATIONS:
+        if number > version:
+            run_script(conn, f'{script}\nPRAGMA user_version = {number};')
+    # Загрузка, прерванная без resume_fts, оставила индекс без триггеров
+    if fts_suspended(conn):
+        resume_fts(conn)
+    return schema_version(conn)
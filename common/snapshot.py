@@ -0,0 +1,355 @@
+import argparse
+import heapq
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from common.db import DEFAULT_DB_PATH, get_manager
+from common.queries import SEARCH_FIELDS
+from common.records import Post
+
+# Снимок таблицы posts по столбцам в одном файле:
+#   заголовок | таблица разделов | id int64[n] | user_id int64[n] | битовые маски NULL user_id, title, body
+#   | смещения title int64[n+1] | смещения body int64[n+1] | куча title (UTF-8) | куча body (UTF-8)
+# Все числа little-endian, разделы выровнены по 8 байт. Файл отображается в память целиком:
+# открытие не читает данные, столбцы id/user_id - представления без копирования, строки
+# декодируются только для запрошенных записей. Бит i маски (младший бит байта i // 8 первый) - NULL
+# в строке i; значение под ним в столбце - 0 или пустая строка
+MAGIC = b'POSTSNAP'
+VERSION = 2
+HEADER = struct.Struct('<8sIIQd')
+SECTION = struct.Struct('<QQ')
+NULLABLE = ('user_id', 'title', 'body')
+SECTIONS = ('id', 'user_id', 'user_id_nulls', 'title_nulls', 'body_nulls', 'title_offsets', 'body_offsets',
+            'title', 'body')
+ALIGN = 8
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def padding(position):
+    return -position % ALIGN
+
+
+def int64_bytes(values):
+    if sys.byteorder != 'little':
+        values = array('q', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def null_bitmap(rows, count):
+    bitmap = bytearray((count + 7) // 8)
+    for index in rows:
+        bitmap[index >> 3] |= 1 << (index & 7)
+    return bytes(bitmap)
+
+
+def search_pattern(text):
+    # Поиск без учёта регистра, как в SQLite, но прямо по байтам UTF-8: каждый символ
+    # превращается в выбор из его строчной и прописной формы
+    parts = []
+    for char in text:
+        variants = sorted(set((char, char.lower(), char.upper())))
+        if len(variants) == 1:
+            parts.append(re.escape(char.encode('utf-8')))
+        else:
+            parts.append(b'(?:' + b'|'.join(re.escape(variant.encode('utf-8')) for variant in variants) + b')')
+    return re.compile(b''.join(parts))
+
+
+def export_snapshot(path, db_path=DEFAULT_DB_PATH, batch_size=50000):
+    # Строки читаются курсором пачками, кучи строк пишутся во временные файлы, в память попадают
+    # только числовые столбцы (32 байта на пост). Готовый файл подменяет старый атомарно
+    conn = get_manager(db_path).connection()
+    ids = array('q')
+    user_ids = array('q')
+    offsets = {'title': array('q', [0]), 'body': array('q', [0])}
+    # Номера строк с NULL по столбцам, обычно их нет или мало
+    nulls = dict((name, []) for name in NULLABLE)
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryFile(dir=directory) as titles, tempfile.TemporaryFile(dir=directory) as bodies:
+        heaps = {'title': titles, 'body': bodies}
+        sizes = {'title': 0, 'body': 0}
+        cursor = conn.execute('SELECT id, user_id, title, body FROM posts ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            encoded = {'title': [], 'body': []}
+            for post_id, user_id, title, body in rows:
+                if user_id is None:
+                    nulls['user_id'].append(len(ids))
+                    user_id = 0
+                for name, value in (('title', title), ('body', body)):
+                    if value is None:
+                        nulls[name].append(len(ids))
+                        value = ''
+                    data = value.encode('utf-8')
+                    encoded[name].append(data)
+                    sizes[name] += len(data)
+                    offsets[name].append(sizes[name])
+                ids.append(post_id)
+                user_ids.append(user_id)
+            for name in heaps:
+                heaps[name].write(b''.join(encoded[name]))
+
+        count = len(ids)
+        numeric = {
+            'id': int64_bytes(ids),
+            'user_id': int64_bytes(user_ids),
+            'title_offsets': int64_bytes(offsets['title']),
+            'body_offsets': int64_bytes(offsets['body']),
+        }
+        for name in NULLABLE:
+            numeric[f'{name}_nulls'] = null_bitmap(nulls[name], count)
+        lengths = dict((name, len(data)) for name, data in numeric.items())
+        lengths.update(sizes)
+
+        position = HEADER.size + SECTION.size * len(SECTIONS)
+        table = []
+        for name in SECTIONS:
+            position += padding(position)
+            table.append((position, lengths[name]))
+            position += lengths[name]
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(SECTIONS), count, time.time()))
+            for offset, size in table:
+                f.write(SECTION.pack(offset, size))
+            for name, (offset, _) in zip(SECTIONS, table):
+                f.write(b'\0' * (offset - f.tell()))
+                if name in numeric:
+                    f.write(numeric[name])
+                else:
+                    heaps[name].seek(0)
+                    shutil.copyfileobj(heaps[name], f, 1024 * 1024)
+        os.replace(tmp_path, path)
+    return count
+
+
+# Чтение снимка через mmap. Запросы повторяют PostsRepository: by_id, by_user, search
+# возвращают строки (id, user_id, title, body)
+class PostSnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise SnapshotError(f"Пустой файл снимка: {path}")
+        magic, version, sections, self.count, self.created_at = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or sections != len(SECTIONS):
+            self.close()
+            raise SnapshotError(f"Не снимок posts версии {VERSION}: {path}")
+        self.sections = {}
+        for index, name in enumerate(SECTIONS):
+            offset, size = SECTION.unpack_from(self.map, HEADER.size + SECTION.size * index)
+            if offset + size > len(self.map):
+                self.close()
+                raise SnapshotError(f"Снимок обрезан: {path}")
+            self.sections[name] = (offset, size)
+        self.ids = self.int_column('id')
+        self.user_ids = self.int_column('user_id')
+        self.title_offsets = self.int_column('title_offsets')
+        self.body_offsets = self.int_column('body_offsets')
+        # Маски NULL без единого бита не хранятся: проверка в row() обходится без них
+        self.nulls = {}
+        for name in NULLABLE:
+            offset, size = self.sections[f'{name}_nulls']
+            bitmap = self.map[offset:offset + size]
+            self.nulls[name] = bitmap if bitmap.count(0) != size else None
+
+    def int_column(self, name):
+        offset, size = self.sections[name]
+        view = memoryview(self.map)[offset:offset + size]
+        if np is not None:
+            return np.frombuffer(view, dtype='<i8')
+        if sys.byteorder != 'little':
+            # Без NumPy на big-endian представление без копирования невозможно
+            values = array('q', view)
+            values.byteswap()
+            return values
+        return view.cast('q')
+
+    def __len__(self):
+        return self.count
+
+    def text(self, name, index):
+        offsets = self.title_offsets if name == 'title' else self.body_offsets
+        base = self.sections[name][0]
+        return self.map[base + int(offsets[index]):base + int(offsets[index + 1])].decode('utf-8')
+
+    def is_null(self, name, index):
+        bitmap = self.nulls[name]
+        return bitmap is not None and bitmap[index >> 3] >> (index & 7) & 1 == 1
+
+    def null_mask(self, name):
+        # Маска NULL как массив bool длиной count, None - если NULL в столбце нет
+        bitmap = self.nulls[name]
+        if bitmap is None:
+            return None
+        return np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8), count=self.count, bitorder='little').astype(bool)
+
+    def row(self, index):
+        user_id = None if self.is_null('user_id', index) else int(self.user_ids[index])
+        title = None if self.is_null('title', index) else self.text('title', index)
+        body = None if self.is_null('body', index) else self.text('body', index)
+        return int(self.ids[index]), user_id, title, body
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return Post.from_row(self.row(index))
+
+    def rows(self, start=0, stop=None):
+        for index in range(start, self.count if stop is None else min(stop, self.count)):
+            yield self.row(index)
+
+    def position(self, post_id):
+        # id в снимке упорядочены, поиск двоичный
+        if np is not None:
+            index = int(np.searchsorted(self.ids, post_id))
+        else:
+            index = bisect_right(self.ids, post_id) - 1
+            index = max(index, 0)
+        if index < self.count and self.ids[index] == post_id:
+            return index
+        return None
+
+    def by_id(self, post_id):
+        index = self.position(post_id)
+        return self.row(index) if index is not None else None
+
+    def by_user(self, user_id):
+        if np is not None:
+            positions = np.flatnonzero(self.user_ids == user_id).tolist()
+        else:
+            positions = [index for index, value in enumerate(self.user_ids) if value == user_id]
+        # NULL хранится как 0, но, как и в SQLite, не равен никакому user_id
+        return [self.row(index) for index in positions if not self.is_null('user_id', index)]
+
+    def matches(self, pattern, field):
+        # Номера записей по возрастанию, в которых есть совпадение. Поиск идёт прямо по куче строк
+        # в mmap, без декодирования остальных записей
+        offsets = self.title_offsets if field == 'title' else self.body_offsets
+        start, size = self.sections[field]
+        end = start + size
+        match = pattern.search(self.map, start, end)
+        while match is not None:
+            index = bisect_right(offsets, match.start() - start) - 1
+            record_end = start + int(offsets[index + 1])
+            if match.end() <= record_end:
+                yield index
+            # Следующий поиск - с начала следующей записи, одна запись попадает в результат один раз
+            match = pattern.search(self.map, record_end, end)
+
+    def search(self, text, field=None, limit=None):
+        # Как search_posts: подстрока без учёта регистра в title и body (или в поле field),
+        # пустая строка - все записи, результат по возрастанию id
+        if not text:
+            return list(self.rows(0, limit))
+        if field is not None and field not in SEARCH_FIELDS:
+            raise ValueError(f"Неизвестное поле поиска: {field}")
+        pattern = search_pattern(text)
+        indices = heapq.merge(*(self.matches(pattern, name) for name in ((field,) if field else SEARCH_FIELDS)))
+        result = []
+        last = None
+        for index in indices:
+            if index == last:
+                continue
+            last = index
+            result.append(self.row(index))
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def to_frame(self, strings=False):
+        # Для pandas и графиков: числовые столбцы без копирования, строки - только по запросу
+        import pandas as pd
+        user_ids = self.user_ids
+        mask = self.null_mask('user_id')
+        if mask is not None:
+            # NULL в userId - пропуски в целочисленном столбце с маской, значения не копируются
+            user_ids = pd.arrays.IntegerArray(np.asarray(user_ids), mask)
+        columns = {'id': pd.Series(self.ids, copy=False), 'userId': pd.Series(user_ids, copy=False)}
+        if strings:
+            for name in ('title', 'body'):
+                columns[name] = [None if self.is_null(name, index) else self.text(name, index)
+                                 for index in range(self.count)]
+        return pd.DataFrame(columns, copy=False)
+
+    def close(self):
+        self.ids = self.user_ids = self.title_offsets = self.body_offsets = None
+        self.nulls = dict((name, None) for name in NULLABLE)
+        try:
+            self.map.close()
+        except BufferError:
+            # Снаружи ещё живы представления столбцов, отображение закроется вместе с ними
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def restore_snapshot(path, db_path=DEFAULT_DB_PATH, **kwargs):
+    # Загрузка снимка в SQLite без сети: строки идут из mmap прямо в пакетный upsert
+    from common.repository import get_repository
+    from common.schema import migrate
+    migrate(get_manager(db_path).connection())
+    with PostSnapshot(path) as snapshot:
+        return get_repository(db_path).save_rows(snapshot.rows(), **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Снимок posts.db по столбцам")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="записать снимок таблицы posts")
+    export.add_argument('snapshot')
+    export.add_argument('--db', default=DEFAULT_DB_PATH)
+    restore = commands.add_parser('restore', help="загрузить снимок в базу")
+    restore.add_argument('snapshot')
+    restore.add_argument('--db', default=DEFAULT_DB_PATH)
+    info = commands.add_parser('info', help="сведения о снимке")
+    info.add_argument('snapshot')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == 'export':
+        count = export_snapshot(args.snapshot, args.db)
+        print(f"Записано постов: {count}, {os.path.getsize(args.snapshot) / 1024 / 1024:.1f} МБ "
+              f"за {time.perf_counter() - started:.2f} с")
+    elif args.command == 'restore':
+        print("Загружено:", restore_snapshot(args.snapshot, args.db))
+    else:
+        with PostSnapshot(args.snapshot) as snapshot:
+            print(f"Постов: {len(snapshot)}, создан {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.created_at))}")
+            for name in SECTIONS:
+                offset, size = snapshot.sections[name]
+                print(f"  {name:<14} {size / 1024:>12.1f} КБ с позиции {offset}")
+
+
+if __name__ == "__main__":
+    main()
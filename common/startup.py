@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+
+# Замер холодного старта GUI:
+#   python "адание 6/6.py" --startup [N] - запустить приложение N раз под python -X importtime.
+# Каждый запуск отмечает этапы (mark), сам закрывается, когда готов к работе (finished), а итог -
+# медиана времени от запуска процесса до каждого этапа и самые долгие импорты
+STARTUP_ENV = 'LAB_STARTUP'
+TOP_IMPORTS = 15
+RUN_TIMEOUT = 120
+
+# Строка вывода -X importtime: "import time: self [us] | cumulative | imported package"
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Задаётся только в замеряемом процессе: файл, куда записать отметки
+_output = os.environ.get(STARTUP_ENV)
+_marks = []
+
+
+def measuring():
+    return _output is not None
+
+
+def mark(name):
+    if _output is not None:
+        _marks.append((name, time.time()))
+
+
+def finished(quit=None):
+    # Последняя отметка: окно показано и данные готовы. При замере процесс закрывается через quit
+    if _output is None:
+        return
+    mark('ready')
+    with open(_output, 'w', encoding='utf-8') as f:
+        json.dump(_marks, f)
+    if quit is not None:
+        quit()
+
+
+# Вызывает callback, когда виджет первый раз отрисован, - после этого можно делать отложенную инициализацию
+class FirstPaint(QObject):
+    def __init__(self, widget, callback):
+        super().__init__(widget)
+        self.callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            watched.removeEventFilter(self)
+            # Сама отрисовка ещё идёт, callback - следующим событием цикла
+            QTimer.singleShot(0, self.callback)
+        return False
+
+
+def after_first_paint(widget, callback):
+    return FirstPaint(widget, callback)
+
+
+def parse_imports(stderr):
+    imports = []
+    other = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+        elif not line.startswith('import time: self'):
+            other.append(line)
+    return imports, other
+
+
+def measure(argv, runs=1, script=None):
+    # Нужны только замеряющему процессу, само приложение их не импортирует
+    import statistics
+    import subprocess
+    import tempfile
+
+    script = os.path.abspath(script or sys.argv[0])
+    marks = {}
+    imports = {}
+    for run in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'marks.json')
+            env = dict(os.environ, **{STARTUP_ENV: path})
+            started = time.time()
+            try:
+                result = subprocess.run([sys.executable, '-X', 'importtime', script] + argv, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                        timeout=RUN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                print(f"Запуск {run + 1}: приложение не стало готовым за {RUN_TIMEOUT} с", file=sys.stderr)
+                return 1
+            run_imports, other = parse_imports(result.stderr)
+            if not os.path.exists(path):
+                print(f"Запуск {run + 1}: приложение завершилось (код {result.returncode}) без отметки готовности",
+                      file=sys.stderr)
+                print('\n'.join(other[-20:]), file=sys.stderr)
+                return 1
+            with open(path, encoding='utf-8') as f:
+                for name, at in json.load(f):
+                    marks.setdefault(name, []).append((at - started) * 1000)
+            for name, self_us, cumulative_us, level in run_imports:
+                imports.setdefault((name, level), []).append((self_us, cumulative_us))
+
+    print(f"Старт {os.path.basename(script)}, запусков: {runs} (медиана, мс от запуска процесса)")
+    for name, values in marks.items():
+        print(f"  {name:<14} {statistics.median(values):>9.1f}")
+    total_self = sum(statistics.median(s for s, _ in values) for values in imports.values()) / 1000
+    print(f"Импорты: модулей {len(imports)}, всего {total_self:.1f} мс; самые долгие (cumulative):")
+    print(f"  {'self, мс':>9} {'cumul, мс':>10}  модуль")
+    heaviest = sorted(imports.items(), key=lambda item: statistics.median(c for _, c in item[1]), reverse=True)
+    for (name, level), values in heaviest[:TOP_IMPORTS]:
+        self_ms = statistics.median(s for s, _ in values) / 1000
+        cumulative_ms = statistics.median(c for _, c in values) / 1000
+        print(f"  {self_ms:>9.1f} {cumulative_ms:>10.1f}  {'  ' * level}{name}")
+    return 0
+
+
+def measure_from_argv(argv=None):
+    # Разбирает --startup [N]: вместо обычного запуска замеряет старт и завершает процесс,
+    # иначе возвращает остальные аргументы как есть
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--startup', type=int, nargs='?', const=1, default=None)
+    args, rest = parser.parse_known_args(argv)
+    if args.startup and not measuring():
+        sys.exit(measure(rest, args.startup))
+    return rest
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+# Локальная замена jsonplaceholder для замеров без интернета:
+#   python -m common.stub_server --posts 1000000 --latency 20 --error-rate 0.01
+#   POSTS_API_URL=http://127.0.0.1:8000 python "Задание 3/Лаба № 3.py"
+
+REASONS = {
+    200: 'OK', 201: 'Created', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 429: 'Too Many Requests', 500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+WORDS = ('sunt', 'aut', 'facere', 'repellat', 'provident', 'occaecati', 'excepturi', 'optio', 'reprehenderit',
+         'qui', 'est', 'esse', 'dolor', 'ea', 'molestias', 'quasi', 'nesciunt', 'quia', 'et', 'suscipit',
+         'recusandae', 'consequuntur', 'expedita', 'rerum', 'tempore', 'vitae', 'sequi', 'sint', 'nihil')
+
+PHRASES = 4096
+
+# Фильтры списка, как у json-server: userId=1, id_gte=10, id_lte=20, _start/_end/_limit
+FILTER_FIELDS = ('userId', 'id')
+
+
+def generate_posts(count, posts_per_user=10, seed=1):
+    # Детерминированный набор: при одинаковых параметрах ответы совпадают байт в байт
+    # Заголовки и строки тела собираются из готовых наборов фраз: миллион постов генерируется за секунды
+    rng = random.Random(seed)
+    titles = [' '.join(rng.choices(WORDS, k=rng.randint(3, 8))) for _ in range(PHRASES)]
+    lines = [' '.join(rng.choices(WORDS, k=rng.randint(6, 12))) for _ in range(PHRASES)]
+    posts = {}
+    for post_id in range(1, count + 1):
+        posts[post_id] = {'userId': (post_id - 1) // posts_per_user + 1, 'id': post_id,
+                          'title': rng.choice(titles), 'body': '\n'.join(rng.choices(lines, k=4))}
+    return posts
+
+
+class StubState:
+    def __init__(self, posts, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=1):
+        self.posts = posts
+        self.next_id = max(posts, default=0) + 1
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.version = 0
+        self._listing = None
+        self._values = None
+        self.requests = 0
+
+    def changed(self):
+        self.version += 1
+        self._listing = None
+        self._values = None
+
+    def listing(self):
+        # Полный список и его ETag считаются один раз на версию данных, дальше отдаются готовыми
+        if self._listing is None:
+            data = json.dumps(list(self.posts.values())).encode('utf-8')
+            self._listing = data, etag_for(data)
+        return self._listing
+
+    def values(self):
+        # Список постов на текущую версию: постраничный запрос - срез, а не проход по всем постам
+        if self._values is None:
+            self._values = list(self.posts.values())
+        return self._values
+
+    def select(self, query):
+        posts = self.values()
+        for key, values in query.items():
+            field, _, op = key.partition('_')
+            if key.startswith('_') or field not in FILTER_FIELDS:
+                continue
+            value = int(values[0])
+            if op == 'gte':
+                posts = [post for post in posts if post[field] >= value]
+            elif op == 'lte':
+                posts = [post for post in posts if post[field] <= value]
+            elif op == 'ne':
+                posts = [post for post in posts if post[field] != value]
+            else:
+                allowed = set(int(item) for item in values)
+                posts = [post for post in posts if post[field] in allowed]
+        start = int(query.get('_start', ['0'])[0])
+        if '_end' in query:
+            posts = posts[start:int(query['_end'][0])]
+        elif '_limit' in query:
+            posts = posts[start:start + int(query['_limit'][0])]
+        elif start:
+            posts = posts[start:]
+        return posts
+
+
+def etag_for(body):
+    return 'W/"%s"' % hashlib.sha1(body).hexdigest()
+
+
+async def read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, body
+
+
+def handle(state, method, target, headers, body):
+    # Возвращает (статус, тело, ETag)
+    url = urlsplit(target)
+    parts = [part for part in url.path.split('/') if part]
+    if not parts or parts[0] != 'posts' or len(parts) > 2:
+        return 404, b'{}', None
+    try:
+        post_id = int(parts[1]) if len(parts) == 2 else None
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        return 400, b'{}', None
+    if not isinstance(payload, dict):
+        # Пост - объект JSON; [1], "x" или null не разобрать в поля
+        return 400, b'{}', None
+
+    if method == 'GET':
+        if post_id is None:
+            query = parse_qs(url.query)
+            if query:
+                try:
+                    posts = state.select(query)
+                except ValueError:
+                    # Нечисловое значение фильтра или _start/_end/_limit
+                    return 400, b'{}', None
+                data = json.dumps(posts).encode('utf-8')
+                etag = etag_for(data)
+            else:
+                data, etag = state.listing()
+        elif post_id in state.posts:
+            data = json.dumps(state.posts[post_id]).encode('utf-8')
+            etag = etag_for(data)
+        else:
+            return 404, b'{}', None
+        if headers.get('if-none-match') == etag:
+            return 304, b'', etag
+        return 200, data, etag
+
+    if method == 'POST' and post_id is None:
+        post = dict(payload, id=state.next_id)
+        state.posts[post['id']] = post
+        state.next_id += 1
+        state.changed()
+        return 201, json.dumps(post).encode('utf-8'), None
+
+    if method in ('PUT', 'PATCH') and post_id is not None:
+        if post_id not in state.posts:
+            return 404, b'{}', None
+        post = dict(state.posts[post_id], **payload) if method == 'PATCH' else dict(payload)
+        post['id'] = post_id
+        state.posts[post_id] = post
+        state.changed()
+        return 200, json.dumps(post).encode('utf-8'), None
+
+    if method == 'DELETE' and post_id is not None:
+        if state.posts.pop(post_id, None) is not None:
+            state.changed()
+        return 200, b'{}', None
+
+    return 405, b'{}', None
+
+
+async def serve_client(state, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except (asyncio.IncompleteReadError, ValueError):
+                break
+            if request is None:
+                break
+            method, target, headers, body = request
+            state.requests += 1
+
+            delay = state.latency + (state.rng.uniform(-state.jitter, state.jitter) if state.jitter else 0.0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if state.error_rate and state.rng.random() < state.error_rate:
+                status, data, etag = state.error_status, b'{}', None
+            else:
+                status, data, etag = handle(state, method, target, headers, body)
+
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            head = [f'HTTP/1.1 {status} {REASONS.get(status, "")}',
+                    'Content-Type: application/json; charset=utf-8',
+                    f'Content-Length: {len(data)}']
+            if etag:
+                head.append(f'ETag: {etag}')
+            if not keep_alive:
+                head.append('Connection: close')
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+            if data:
+                writer.write(data)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.CancelledError):
+        # Отмена при остановке сервера - обычное завершение соединения
+        pass
+    finally:
+        writer.close()
+
+
+async def run_server(state, host='127.0.0.1', port=8000, ready=None):
+    server = await asyncio.start_server(lambda r, w: serve_client(state, r, w), host, port)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+# Сервер в фоновом потоке - для бенчмарков и проверок из того же процесса.
+# Возвращает (state, base_url, stop)
+def start_in_thread(posts=100, host='127.0.0.1', port=0, **options):
+    state = StubState(generate_posts(posts) if isinstance(posts, int) else posts, **options)
+    started = threading.Event()
+    holder = {}
+
+    def ready(server):
+        holder['port'] = server.sockets[0].getsockname()[1]
+        started.set()
+
+    loop = asyncio.new_event_loop()
+
+    task = loop.create_task(run_server(state, host, port, ready))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Например, порт занят: ошибка передаётся вызывающему потоку
+            holder['error'] = e
+        finally:
+            started.set()
+            # Открытые keep-alive соединения закрываются до остановки цикла
+            pending = asyncio.all_tasks(loop)
+            for item in pending:
+                item.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+    if 'error' in holder:
+        thread.join()
+        raise holder['error']
+
+    def stop():
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(timeout=5)
+
+    return state, f'http://{host}:{holder["port"]}', stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный сервер /posts, совместимый с jsonplaceholder")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--posts', type=int, default=100, help="размер синтетического набора")
+    parser.add_argument('--posts-per-user', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа, мс")
+    parser.add_argument('--jitter', type=float, default=0.0, help="разброс задержки, мс")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов с ошибкой, 0..1")
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args()
+
+    state = StubState(generate_posts(args.posts, args.posts_per_user, args.seed), args.latency / 1000,
+                      args.jitter / 1000, args.error_rate, args.error_status, args.seed)
+    print(f"Сервер запущен на http://{args.host}:{args.port}, постов: {len(state.posts)}")
+    try:
+        asyncio.run(run_server(state, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
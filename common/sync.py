@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from collections import deque
+
+from common.db import get_manager
+from common.http_client import get_client
+from common.ingest import apply_bulk_pragmas, batched
+from common.json_stream import iter_json_array
+from common.repository import get_repository
+
+
+class SyncInterrupted(Exception):
+    pass
+
+
+def post_hash(post):
+    # Хэш содержимого поста: по нему полный проход пишет в базу только изменившиеся записи
+    return hash((post['userId'], post['title'], post['body']))
+
+
+# Итог одного прохода синхронизации
+class SyncResult:
+    def __init__(self, full):
+        self.full = full
+        self.rows = 0
+        self.changed = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        kind = "полная" if self.full else "новые записи"
+        return (f"Синхронизация ({kind}): получено {self.rows}, изменено {self.changed}, "
+                f"{self.bytes / 1024:.1f} КБ за {self.seconds:.2f} с")
+
+
+# Метрики по последним проходам: длительность, изменённые строки, переданные байты
+class SyncMetrics:
+    def __init__(self, history=100):
+        self._lock = threading.Lock()
+        self.history = deque(maxlen=history)
+        self.runs = 0
+        self.changed = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def record(self, result):
+        with self._lock:
+            self.history.append(result)
+            self.runs += 1
+            self.changed += result.changed
+            self.bytes += result.bytes
+            self.seconds += result.seconds
+
+    def summary(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'changed': self.changed,
+                'bytes': self.bytes,
+                'mean_seconds': round(self.seconds / self.runs, 3) if self.runs else 0.0,
+                'last': str(self.history[-1]) if self.history else None,
+            }
+
+
+# Интервал до следующего прохода: сбрасывается при изменениях, растёт, пока данные не меняются.
+# Случайный разброс не даёт многим клиентам приходить к серверу одновременно.
+class AdaptiveInterval:
+    def __init__(self, base, maximum, factor=2.0, jitter=0.1):
+        self.base = base
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.current = base
+
+    def next(self, changed):
+        if changed:
+            self.current = self.base
+        else:
+            self.current = min(self.maximum, self.current * self.factor)
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reset(self):
+        self.current = self.base
+
+
+# Синхронизация постов с API. Обычный проход запрашивает только записи выше известного
+# максимального id; раз в full_every проходов (и при первом) - весь список через кэш
+# с ревалидацией, из него в базу попадают только записи с изменившимся хэшем
+class IncrementalSync:
+    def __init__(self, db_path='posts.db', path='posts', client=None, full_every=10, batch_size=1000,
+                 chunk_size=65536):
+        self.db_path = db_path
+        self.path = path
+        self.client = client
+        self.full_every = full_every
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.high_water_mark = None
+        self.hashes = {}
+        self.runs_since_full = 0
+        self.metrics = SyncMetrics()
+        self._lock = threading.Lock()
+
+    def run(self, force=False, progress=None, on_batch=None, interrupted=None):
+        # force - полная загрузка с записью всех строк, даже если ответ и хэши не изменились
+        with self._lock:
+            full = force or self.high_water_mark is None or self.runs_since_full + 1 >= self.full_every
+            result = SyncResult(full)
+            started = time.perf_counter()
+            manager = get_manager(self.db_path)
+            try:
+                if full:
+                    self._run_full(result, force, manager, progress, on_batch, interrupted)
+                    self.runs_since_full = 0
+                else:
+                    self._run_incremental(result, manager, progress, on_batch, interrupted)
+                    self.runs_since_full += 1
+            finally:
+                manager.close_thread()
+                result.seconds = time.perf_counter() - started
+            self.metrics.record(result)
+            return result
+
+    def _run_full(self, result, force, manager, progress, on_batch, interrupted):
+        stream = (self.client or get_client()).stream_cached(self.path, chunk_size=self.chunk_size)
+        if stream.changed is False and self.high_water_mark is not None and not force:
+            return
+        network = stream.source == 'network'
+        chunks = self._read(stream, stream.content_length, result if network else None, progress, interrupted)
+        self.high_water_mark = self._ingest(chunks, result, force, manager, on_batch)
+
+    def _run_incremental(self, result, manager, progress, on_batch, interrupted):
+        client = self.client or get_client()
+        response = client.get(self.path, params={'id_gte': self.high_water_mark + 1}, stream=True,
+                              metric=f'{self.path}?id_gte')
+        try:
+            response.raise_for_status()
+            content_length = int(response.headers.get('Content-Length') or 0) or None
+            chunks = self._read(response.iter_content(self.chunk_size), content_length, result, progress,
+                                interrupted)
+            high_water_mark = self._ingest(chunks, result, False, manager, on_batch)
+        finally:
+            response.close()
+        if high_water_mark is not None:
+            self.high_water_mark = max(self.high_water_mark, high_water_mark)
+
+    def _read(self, chunks, content_length, result, progress, interrupted):
+        # result=None - тело взято из кэша и по сети не передавалось
+        received = 0
+        percent = -1
+        for chunk in chunks:
+            if interrupted is not None and interrupted():
+                raise SyncInterrupted()
+            received += len(chunk)
+            if result is not None:
+                result.bytes += len(chunk)
+            if progress is not None and content_length:
+                # При сжатии распакованных байтов больше, чем Content-Length, поэтому не выше 99
+                current = min(99, received * 100 // content_length)
+                if current != percent:
+                    percent = current
+                    progress(percent)
+            yield chunk
+
+    def _ingest(self, chunks, result, force, manager, on_batch):
+        connection = manager.connection()
+        apply_bulk_pragmas(connection)
+        high_water_mark = None
+        for batch in batched(iter_json_array(chunks), self.batch_size):
+            result.rows += len(batch)
+            hashes = {post['id']: post_hash(post) for post in batch}
+            changed = [post for post in batch if force or self.hashes.get(post['id']) != hashes[post['id']]]
+            if changed:
+                # Через репозиторий: его кэш запросов сбрасывается для записанных постов
+                stats = get_repository(self.db_path).save(changed, pragmas=False)
+                result.changed += stats.changed
+                if stats.changed and on_batch is not None:
+                    on_batch(stats.changed)
+            # Хэши запоминаются только после записи пачки, прерванный проход повторит её
+            self.hashes.update(hashes)
+            batch_max = max(hashes)
+            if high_water_mark is None or batch_max > high_water_mark:
+                high_water_mark = batch_max
+        return high_water_mark
@@ -1,6 +1,15 @@
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import signal
 import socket
+import time
 
-def start_tcp_server(host='127.0.0.1', port=65432):
+from framing import HEADER, FrameReader, FrameTooLarge, read_frame_async
+
+def start_tcp_server(host='127.0.0.1', port=65432, framed=False):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
         server_socket.bind((host, port))
 
@@ -12,6 +21,10 @@ def start_tcp_server(host='127.0.0.1', port=65432):
             
             print(f"Подключен клиент: {addr}")
 
+            if framed:
+                serve_framed(conn)
+                return
+
             while True:
                 data = conn.recv(1024)
                 if not data:
@@ -21,5 +34,201 @@ def start_tcp_server(host='127.0.0.1', port=65432):
                 
                 conn.sendall(data)
 
+
+def serve_framed(conn):
+    reader = FrameReader(conn)
+    while True:
+        try:
+            payload = reader.read_frame()
+        except (EOFError, ConnectionError):
+            # Клиент закрыл или сбросил соединение, в том числе посреди кадра
+            break
+
+        print(f"Получен кадр от клиента ({len(payload)} байт): {bytes(payload[:80]).decode('utf-8', 'replace')}")
+
+        conn.sendall(HEADER.pack(len(payload)) + payload)
+
+
+# Счётчики подключений и трафика
+class ServerStats:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.connections_total = 0
+        self.connections_active = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            'uptime': round(elapsed, 3),
+            'connections_total': self.connections_total,
+            'connections_active': self.connections_active,
+            'bytes_received': self.bytes_received,
+            'bytes_sent': self.bytes_sent,
+            'recv_mbps': round(self.bytes_received * 8 / elapsed / 1e6, 3),
+            'send_mbps': round(self.bytes_sent * 8 / elapsed / 1e6, 3),
+        }
+
+    def __str__(self):
+        s = self.snapshot()
+        return (f"подключений: {s['connections_active']} активных / {s['connections_total']} всего, "
+                f"принято: {s['bytes_received']} Б ({s['recv_mbps']} Мбит/с), "
+                f"отправлено: {s['bytes_sent']} Б ({s['send_mbps']} Мбит/с)")
+
+
+def raise_open_files_limit():
+    # Тысячи соединений упираются в лимит дескрипторов, поднимаем мягкий лимит до жёсткого
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        with contextlib.suppress(ValueError, OSError):
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def handle_echo(reader, writer, stats, read_size):
+    while True:
+        data = await reader.read(read_size)
+        if not data:
+            break
+        stats.bytes_received += len(data)
+        writer.write(data)
+        # drain даёт обратное давление медленному клиенту, не блокируя остальных
+        await writer.drain()
+        stats.bytes_sent += len(data)
+
+
+async def handle_framed_echo(reader, writer, stats, read_size):
+    while True:
+        header, payload = await read_frame_async(reader)
+        size = len(header) + len(payload)
+        stats.bytes_received += size
+        writer.writelines((header, payload))
+        await writer.drain()
+        stats.bytes_sent += size
+
+
+async def run_event_loop_server(host, port, backlog=1024, read_size=65536, rcvbuf=None, sndbuf=None,
+                                reuse_port=False, stats_interval=5.0, shutdown_timeout=5.0, handler=None):
+    stats = ServerStats()
+    tasks = set()
+    handler = handler or handle_echo
+
+    async def on_connect(reader, writer):
+        sock = writer.get_extra_info('socket')
+        if rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        if sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        task = asyncio.current_task()
+        tasks.add(task)
+        stats.connections_total += 1
+        stats.connections_active += 1
+        try:
+            await handler(reader, writer, stats, read_size)
+        except (ConnectionError, asyncio.IncompleteReadError, FrameTooLarge):
+            pass
+        finally:
+            stats.connections_active -= 1
+            tasks.discard(task)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    server = await asyncio.start_server(on_connect, host, port, backlog=backlog,
+                                        reuse_port=reuse_port or None, limit=read_size)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            loop.add_signal_handler(sig, stop.set)
+
+    async def report():
+        while True:
+            await asyncio.sleep(stats_interval)
+            print(f"[{port}] {stats}")
+
+    reporter = asyncio.create_task(report()) if stats_interval else None
+
+    print(f"Сервер (event loop) запущен на {host}:{port}, backlog={backlog}...")
+    async with server:
+        await stop.wait()
+
+        # Плавная остановка: перестаём принимать, даём активным соединениям доработать
+        print("Остановка сервера, ожидание активных соединений...")
+        server.close()
+        if tasks:
+            await asyncio.wait(set(tasks), timeout=shutdown_timeout)
+        for task in list(tasks):
+            task.cancel()
+        if reporter:
+            reporter.cancel()
+
+    print(f"Сервер остановлен. Итог: {stats}")
+    return stats
+
+
+def _serve_worker(kwargs):
+    asyncio.run(run_event_loop_server(**kwargs))
+
+
+def start_event_loop_server(host='127.0.0.1', port=65432, backlog=1024, read_size=65536,
+                            rcvbuf=None, sndbuf=None, workers=1, stats_interval=5.0, shutdown_timeout=5.0,
+                            framed=False):
+    raise_open_files_limit()
+    kwargs = dict(host=host, port=port, backlog=backlog, read_size=read_size, rcvbuf=rcvbuf,
+                  sndbuf=sndbuf, stats_interval=stats_interval, shutdown_timeout=shutdown_timeout,
+                  handler=handle_framed_echo if framed else handle_echo)
+
+    if workers <= 1:
+        return asyncio.run(run_event_loop_server(**kwargs))
+
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise RuntimeError("SO_REUSEPORT не поддерживается на этой платформе")
+
+    # Каждый процесс слушает тот же порт, ядро распределяет входящие соединения
+    kwargs['reuse_port'] = True
+    processes = [multiprocessing.Process(target=_serve_worker, args=(kwargs,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    def forward_stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, forward_stop)
+    signal.signal(signal.SIGTERM, forward_stop)
+    for process in processes:
+        process.join()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="TCP эхо-сервер")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=65432)
+    parser.add_argument('--mode', choices=['simple', 'event-loop'], default='simple')
+    parser.add_argument('--backlog', type=int, default=1024)
+    parser.add_argument('--read-size', type=int, default=65536)
+    parser.add_argument('--rcvbuf', type=int, default=None)
+    parser.add_argument('--sndbuf', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--stats-interval', type=float, default=5.0)
+    parser.add_argument('--framed', action='store_true', help="кадры с 4-байтовым заголовком длины")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    start_tcp_server()
\ No newline at end of file
+    args = parse_args()
+    if args.mode == 'simple':
+        start_tcp_server(args.host, args.port, framed=args.framed)
+    else:
+        start_event_loop_server(args.host, args.port, backlog=args.backlog, read_size=args.read_size,
+                                rcvbuf=args.rcvbuf, sndbuf=args.sndbuf, workers=args.workers,
+                                stats_interval=args.stats_interval, framed=args.framed)
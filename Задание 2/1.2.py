@@ -1,16 +1,63 @@
+import argparse
 import socket
+import threading
+import time
 
-def start_tcp_client(host='127.0.0.1', port=65432):
+from framing import FrameReader, pack_frames
+
+def start_tcp_client(host='127.0.0.1', port=65432, framed=False, count=1):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
         client_socket.connect((host, port))
 
         print(f"Подключен к серверу {host}:{port}")
         
         message = input("Введите сообщение для отправки: ")
+        if framed:
+            started = time.perf_counter()
+            replies = pipeline_messages(client_socket, [message.encode('utf-8')] * count)
+            elapsed = time.perf_counter() - started
+
+            print(f"Получен ответ от сервера: {replies[-1].decode('utf-8')}")
+            if count > 1:
+                print(f"{count} сообщений за {elapsed:.3f} с ({count / elapsed:.0f} сообщений/с)")
+            return
+
         client_socket.sendall(message.encode('utf-8'))
         data = client_socket.recv(1024)
         
         print(f"Получен ответ от сервера: {data.decode('utf-8')}")
 
+def pipeline_messages(sock, payloads, batch_size=256, buffer_size=65536):
+    # Отправляем кадры подряд из отдельного потока, ответы читаем по порядку в текущем.
+    # Запись и чтение идут одновременно, поэтому буферы сокета не заклинивают друг друга.
+    errors = []
+
+    def sender():
+        try:
+            for i in range(0, len(payloads), batch_size):
+                sock.sendall(pack_frames(payloads[i:i + batch_size]))
+        except OSError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=sender, daemon=True)
+    thread.start()
+    reader = FrameReader(sock, buffer_size)
+    try:
+        replies = [bytes(reader.read_frame()) for _ in payloads]
+    finally:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return replies
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="TCP клиент")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=65432)
+    parser.add_argument('--framed', action='store_true', help="кадры с 4-байтовым заголовком длины")
+    parser.add_argument('--count', type=int, default=1, help="сколько раз отправить сообщение конвейером")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    start_tcp_client()
\ No newline at end of file
+    args = parse_args()
+    start_tcp_client(args.host, args.port, framed=args.framed, count=args.count)
\ No newline at end of file
@@ -1,4 +1,7 @@
+import argparse
+import selectors
 import socket
+import time
 
 def start_udp_server(host='127.0.0.1', port=65432):
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server_socket:
@@ -8,7 +11,8 @@ def start_udp_server(host='127.0.0.1', port=65432):
 
         while True:
             data, addr = server_socket.recvfrom(1024)
-            message = data.decode('utf-8')
+            # Двоичные датаграммы (например, от bench.py) не роняют сервер
+            message = data.decode('utf-8', errors='replace')
 
             print(f"Получено сообщение от клиента {addr}: {message}")
             
@@ -21,5 +25,124 @@ def start_udp_server(host='127.0.0.1', port=65432):
 
     print("Сервер остановлен.")
 
+# Счётчики по каждому клиенту
+class PeerStats:
+    __slots__ = ('packets', 'bytes', 'drops', 'errors')
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.drops = 0
+        self.errors = 0
+
+
+def report_peers(peers, elapsed):
+    total_packets = sum(p.packets for p in peers.values())
+    total_bytes = sum(p.bytes for p in peers.values())
+    total_drops = sum(p.drops for p in peers.values())
+    total_errors = sum(p.errors for p in peers.values())
+    print(f"Клиентов: {len(peers)}, пакетов: {total_packets} ({total_packets / elapsed:.0f}/с), "
+          f"байт: {total_bytes}, потеряно при отправке: {total_drops}, ошибок отправки: {total_errors}")
+    for addr, p in sorted(peers.items(), key=lambda item: item[1].packets, reverse=True)[:10]:
+        print(f"  {addr}: пакетов {p.packets}, байт {p.bytes}, потеряно {p.drops}, ошибок {p.errors}")
+
+
+def is_stop_command(view):
+    return bytes(view).strip().lower() == b"end"
+
+
+def start_batched_udp_server(host='127.0.0.1', port=65432, batch_size=256, rcvbuf=4 * 1024 * 1024,
+                             sndbuf=4 * 1024 * 1024, report_interval=5.0):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server_socket:
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        server_socket.bind((host, port))
+        server_socket.setblocking(False)
+
+        selector = selectors.DefaultSelector()
+        selector.register(server_socket, selectors.EVENT_READ)
+
+        # Буферы выделяются один раз и переиспользуются для каждой пачки
+        views = [memoryview(bytearray(65535)) for _ in range(batch_size)]
+        received = [None] * batch_size
+        peers = {}
+        recv_errors = 0
+        recv_into = server_socket.recvfrom_into
+        send = server_socket.sendto
+        started = time.monotonic()
+        next_report = started + report_interval
+
+        print(f"UDP сервер (пакетный режим) запущен на {host}:{port}, SO_RCVBUF="
+              f"{server_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)}...")
+
+        running = True
+        while running:
+            timeout = max(next_report - time.monotonic(), 0) if report_interval else None
+            if selector.select(timeout):
+                # Аналог recvmmsg: вычитываем всё, что накопилось в сокете, до EAGAIN или размера пачки
+                count = 0
+                while count < batch_size:
+                    try:
+                        size, addr = recv_into(views[count])
+                    except BlockingIOError:
+                        break
+                    except OSError:
+                        # ICMP "порт недоступен" от ушедшего клиента приходит ошибкой следующего чтения
+                        recv_errors += 1
+                        continue
+                    received[count] = (size, addr)
+                    count += 1
+
+                for i in range(count):
+                    size, addr = received[i]
+                    data = views[i][:size]
+                    # Проверяем только короткие датаграммы, остальные не могут быть командой
+                    if size <= 16 and is_stop_command(data):
+                        running = False
+                        continue
+
+                    stats = peers.get(addr)
+                    if stats is None:
+                        stats = peers[addr] = PeerStats()
+                    stats.packets += 1
+                    stats.bytes += size
+                    try:
+                        send(data, addr)
+                    except (BlockingIOError, InterruptedError):
+                        stats.drops += 1
+                    except OSError:
+                        # Клиент ушёл (ConnectionRefusedError по ICMP) или адрес недоступен: сервер работает дальше
+                        stats.errors += 1
+
+            if report_interval and time.monotonic() >= next_report:
+                report_peers(peers, time.monotonic() - started)
+                next_report = time.monotonic() + report_interval
+
+        print("Получена команда остановки сервера. Завершение работы...")
+        report_peers(peers, max(time.monotonic() - started, 1e-9))
+        if recv_errors:
+            print(f"Ошибок чтения: {recv_errors}")
+        selector.close()
+
+    print("Сервер остановлен.")
+    return peers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="UDP эхо-сервер")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=65432)
+    parser.add_argument('--mode', choices=['simple', 'batched'], default='simple')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--rcvbuf', type=int, default=4 * 1024 * 1024)
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    start_udp_server()
\ No newline at end of file
+    args = parse_args()
+    if args.mode == 'simple':
+        start_udp_server(args.host, args.port)
+    else:
+        start_batched_udp_server(args.host, args.port, batch_size=args.batch_size, rcvbuf=args.rcvbuf,
+                                 report_interval=args.report_interval)
\ No newline at end of file
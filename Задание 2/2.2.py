@@ -1,7 +1,28 @@
+import argparse
+import asyncio
 import socket
+import struct
+import time
 
-def start_udp_client(host='127.0.0.1', port=65432):
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client_socket:
+# Порядковый номер в начале каждой датаграммы: эхо-сервер возвращает его как есть,
+# по нему ответ находит свой запрос, даже если ответы пришли не по порядку
+SEQ_HEADER = struct.Struct('!Q')
+
+
+class RequestTimeout(TimeoutError):
+    pass
+
+
+def open_client_socket(timeout):
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # Потерянный пакет больше не вешает клиента навсегда
+    client_socket.settimeout(timeout)
+    return client_socket
+
+
+def start_udp_client(host='127.0.0.1', port=65432, timeout=2.0):
+    client_socket = open_client_socket(timeout)
+    try:
         while True:
             message = input("Введите сообщение для отправки или 'end' для завершения работы сервера: ")
             client_socket.sendto(message.encode('utf-8'), (host, port))
@@ -10,9 +31,219 @@ def start_udp_client(host='127.0.0.1', port=65432):
                 print("Клиент завершает работу.")
 
                 break
-            data, server = client_socket.recvfrom(1024)
+            try:
+                data, server = client_socket.recvfrom(1024)
+            except socket.timeout:
+                print(f"Ответ не получен за {timeout} с")
+                # Опоздавший ответ пришёл бы в этот сокет и был бы принят за ответ на следующее
+                # сообщение: новый сокет - новый порт, до него старые ответы не дойдут
+                client_socket.close()
+                client_socket = open_client_socket(timeout)
+                continue
 
             print(f"Получен ответ от сервера: {data.decode('utf-8')}")
+    finally:
+        client_socket.close()
+
+
+class PendingRequest:
+    __slots__ = ('future', 'datagram', 'deadline', 'attempts', 'timer')
+
+    def __init__(self, future, datagram, deadline):
+        self.future = future
+        self.datagram = datagram
+        self.deadline = deadline
+        self.attempts = 1
+        self.timer = None
+
+
+class ClientStats:
+    __slots__ = ('sent', 'replies', 'retransmits', 'timeouts', 'duplicates')
+
+    def __init__(self):
+        self.sent = 0
+        self.replies = 0
+        self.retransmits = 0
+        self.timeouts = 0
+        self.duplicates = 0
+
+    def __str__(self):
+        return (f"отправлено {self.sent}, ответов {self.replies}, повторов {self.retransmits}, "
+                f"таймаутов {self.timeouts}, дубликатов {self.duplicates}")
+
+
+class UdpClientProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client):
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        self.client.reply_received(data)
+
+    def error_received(self, exc):
+        # ICMP "порт недоступен" и подобное: запрос повторится или истечёт по своему сроку
+        pass
+
+    def connection_lost(self, exc):
+        self.client.fail_pending(exc or ConnectionError("Сокет закрыт"))
+
+
+# Асинхронный UDP клиент: до window запросов в полёте одновременно, ответы сопоставляются
+# по номеру, потерянные запросы повторяются через timeout (с удвоением интервала), пока не
+# истечёт deadline запроса.
+#   async with AsyncUdpClient(host, port) as client:
+#       reply = await client.request(b'hello')
+class AsyncUdpClient:
+    def __init__(self, host='127.0.0.1', port=65432, window=1024, timeout=0.2, deadline=2.0, max_timeout=1.0,
+                 rcvbuf=4 * 1024 * 1024, sndbuf=4 * 1024 * 1024):
+        self.host = host
+        self.port = port
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+        self.window = window
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_timeout = max_timeout
+        self.stats = ClientStats()
+        self.pending = {}
+        self.next_seq = 0
+        self.transport = None
+        self.loop = None
+        self.slots = None
+
+    async def open(self):
+        self.loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.window)
+        self.transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: UdpClientProtocol(self), remote_addr=(self.host, self.port))
+        # Буферы сокета вмещают целое окно ответов, иначе пачка ответов теряется до чтения
+        sock = self.transport.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        return self
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        self.fail_pending(ConnectionError("Клиент закрыт"))
+
+    async def request(self, payload, deadline=None):
+        # Возвращает ответ без заголовка; RequestTimeout, если ответа нет до истечения deadline секунд
+        async with self.slots:
+            seq = self.next_seq
+            self.next_seq += 1
+            datagram = SEQ_HEADER.pack(seq) + payload
+            entry = PendingRequest(self.loop.create_future(), datagram,
+                                   self.loop.time() + (self.deadline if deadline is None else deadline))
+            self.pending[seq] = entry
+            self.transport.sendto(datagram)
+            self.stats.sent += 1
+            entry.timer = self.loop.call_at(min(self.loop.time() + self.timeout, entry.deadline),
+                                            self.retransmit, seq)
+            try:
+                return await entry.future
+            finally:
+                # Отменённый снаружи запрос не должен оставлять таймер и запись
+                if self.pending.pop(seq, None) is not None:
+                    entry.timer.cancel()
+
+    async def request_many(self, payloads, deadline=None):
+        # Результаты в порядке payloads; для запросов без ответа - исключение RequestTimeout
+        return await asyncio.gather(*(self.request(payload, deadline) for payload in payloads),
+                                    return_exceptions=True)
+
+    def reply_received(self, data):
+        if len(data) < SEQ_HEADER.size:
+            return
+        (seq,) = SEQ_HEADER.unpack_from(data)
+        entry = self.pending.pop(seq, None)
+        if entry is None:
+            # Ответ на повтор уже обработанного запроса или чужая датаграмма
+            self.stats.duplicates += 1
+            return
+        entry.timer.cancel()
+        self.stats.replies += 1
+        if not entry.future.done():
+            entry.future.set_result(data[SEQ_HEADER.size:])
+
+    def retransmit(self, seq):
+        entry = self.pending.get(seq)
+        if entry is None or entry.future.done():
+            return
+        now = self.loop.time()
+        if now >= entry.deadline or self.transport is None:
+            del self.pending[seq]
+            self.stats.timeouts += 1
+            entry.future.set_exception(RequestTimeout(f"Нет ответа на запрос {seq} за {entry.attempts} попыток"))
+            return
+        self.transport.sendto(entry.datagram)
+        self.stats.sent += 1
+        self.stats.retransmits += 1
+        interval = min(self.timeout * 2 ** entry.attempts, self.max_timeout)
+        entry.attempts += 1
+        entry.timer = self.loop.call_at(min(now + interval, entry.deadline), self.retransmit, seq)
+
+    def fail_pending(self, exc):
+        pending, self.pending = self.pending, {}
+        for entry in pending.values():
+            if entry.timer is not None:
+                entry.timer.cancel()
+            if not entry.future.done():
+                entry.future.set_exception(exc)
+
+
+async def run_load(host, port, count, size, window, timeout, deadline):
+    # Нагрузка: window сопрограмм, каждая шлёт следующий запрос сразу после ответа на предыдущий
+    payload = b'x' * size
+    latencies = []
+    failures = 0
+    remaining = count
+
+    async with AsyncUdpClient(host, port, window=window, timeout=timeout, deadline=deadline) as client:
+        async def worker():
+            nonlocal remaining, failures
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    await client.request(payload)
+                except RequestTimeout:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(window, count))))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{count} запросов за {elapsed:.3f} с ({len(latencies) / elapsed:.0f} ответов/с), без ответа: {failures}")
+    if latencies:
+        print(f"Задержка: p50 {latencies[len(latencies) // 2] * 1000:.3f} мс, "
+              f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.3f} мс")
+    print(f"Клиент: {client.stats}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="UDP клиент")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=65432)
+    parser.add_argument('--count', type=int, default=0, help="отправить столько запросов асинхронным клиентом")
+    parser.add_argument('--size', type=int, default=64, help="размер запроса в байтах без заголовка")
+    parser.add_argument('--window', type=int, default=256, help="запросов в полёте одновременно")
+    parser.add_argument('--timeout', type=float, default=0.2, help="интервал до первого повтора, с")
+    parser.add_argument('--deadline', type=float, default=2.0, help="срок ответа на запрос, с")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    start_udp_client()
\ No newline at end of file
+    args = parse_args()
+    if args.count:
+        asyncio.run(run_load(args.host, args.port, args.count, args.size, args.window, args.timeout, args.deadline))
+    else:
+        start_udp_client(args.host, args.port)
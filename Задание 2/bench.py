@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import socket
+import struct
+import sys
+import time
+
+from framing import HEADER
+
+# Заголовок UDP датаграммы бенчмарка: порядковый номер и время отправки в нс
+UDP_HEADER = struct.Struct('!QQ')
+# Буферы сокета UDP отправителя: пачка ответов не должна теряться до чтения, иначе потери - свои же
+UDP_SOCKET_BUFFER = 4 * 1024 * 1024
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(proto, args, elapsed, sent, received, latencies_ns, payload_bytes, errors=0):
+    latencies_ns.sort()
+    ms = [value / 1e6 for value in (percentile(latencies_ns, 0.5), percentile(latencies_ns, 0.99),
+                                    percentile(latencies_ns, 0.999))] if latencies_ns else [None] * 3
+    return {
+        'proto': proto,
+        'host': args.host,
+        'port': args.port,
+        'connections': args.connections,
+        'size': args.size,
+        'rate': args.rate,
+        'window': args.window if proto == 'udp' and not args.rate else None,
+        'duration': round(elapsed, 3),
+        'sent': sent,
+        'received': received,
+        'errors': errors,
+        'loss': round(1 - received / sent, 6) if sent else 0.0,
+        'throughput_msgs': round(received / elapsed, 1),
+        'throughput_mbps': round(payload_bytes * 8 / elapsed / 1e6, 3),
+        'latency_ms': {
+            'p50': ms[0],
+            'p99': ms[1],
+            'p999': ms[2],
+            'mean': sum(latencies_ns) / len(latencies_ns) / 1e6 if latencies_ns else None,
+            'max': latencies_ns[-1] / 1e6 if latencies_ns else None,
+        },
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+    }
+
+
+async def pace(next_send, interval):
+    if interval:
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return max(next_send + interval, time.perf_counter() - interval)
+    return next_send
+
+
+async def tcp_connection(host, port, message, interval, deadline, timeout, latencies, counters):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    expected = len(message)
+    next_send = time.perf_counter()
+    try:
+        while time.perf_counter() < deadline:
+            next_send = await pace(next_send, interval)
+            started = time.perf_counter_ns()
+            writer.write(message)
+            counters['sent'] += 1
+            try:
+                await asyncio.wait_for(reader.readexactly(expected), timeout)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                # Нет ответа (например, однопоточный сервер занят другим клиентом) или сервер закрыл
+                # соединение: сообщение считается ошибкой, остальные соединения продолжают работу
+                counters['errors'] += 1
+                return
+            latencies.append(time.perf_counter_ns() - started)
+            counters['received'] += 1
+    finally:
+        writer.close()
+        with contextlib.suppress(ConnectionError):
+            await writer.wait_closed()
+
+
+async def run_tcp(args):
+    payload = b'x' * args.size
+    message = HEADER.pack(len(payload)) + payload if args.framed else payload
+    interval = 1 / args.rate if args.rate else 0
+    latencies = []
+    counters = {'sent': 0, 'received': 0, 'errors': 0}
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(tcp_connection(args.host, args.port, message, interval, deadline, args.timeout,
+                                          latencies, counters)
+                           for _ in range(args.connections)))
+    elapsed = time.perf_counter() - started
+    return summarize('tcp', args, elapsed, counters['sent'], counters['received'], latencies,
+                     counters['received'] * len(message), counters['errors'])
+
+
+class UdpSender(asyncio.DatagramProtocol):
+    def __init__(self, window=0):
+        self.transport = None
+        # seq -> время отправки в нс, по порядку отправки: первые - самые старые
+        self.pending = {}
+        self.window = window
+        self.space = asyncio.Event()
+        self.latencies = []
+        self.received = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        now = time.perf_counter_ns()
+        seq, sent_ns = UDP_HEADER.unpack_from(data)
+        if self.pending.pop(seq, None) is not None:
+            self.received += 1
+            self.latencies.append(now - sent_ns)
+            if len(self.pending) < self.window:
+                self.space.set()
+
+    def error_received(self, exc):
+        pass
+
+    def expire(self, sent_before_ns):
+        # Запросы без ответа дольше срока потеряны и больше не занимают окно
+        while self.pending:
+            seq, sent_ns = next(iter(self.pending.items()))
+            if sent_ns > sent_before_ns:
+                break
+            del self.pending[seq]
+
+    async def wait_for_window(self, timeout):
+        self.space.clear()
+        try:
+            await asyncio.wait_for(self.space.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.expire(time.perf_counter_ns() - int(timeout * 1e9))
+
+
+async def udp_sender(host, port, size, interval, deadline, drain_timeout, window):
+    loop = asyncio.get_running_loop()
+    # Окно запросов в полёте - только без ограничения скорости: иначе отправитель заваливает
+    # свой же сокет ответами, и в потери попадает то, что не успел прочитать он сам
+    window = 0 if interval else window
+    transport, protocol = await loop.create_datagram_endpoint(lambda: UdpSender(window), remote_addr=(host, port))
+    sock = transport.get_extra_info('socket')
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_SOCKET_BUFFER)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, UDP_SOCKET_BUFFER)
+    padding = b'x' * max(size - UDP_HEADER.size, 0)
+    seq = 0
+    next_send = time.perf_counter()
+    try:
+        while time.perf_counter() < deadline:
+            if window and len(protocol.pending) >= window:
+                await protocol.wait_for_window(max(min(drain_timeout, deadline - time.perf_counter()), 0))
+                continue
+            next_send = await pace(next_send, interval)
+            sent_ns = time.perf_counter_ns()
+            protocol.pending[seq] = sent_ns
+            transport.sendto(UDP_HEADER.pack(seq, sent_ns) + padding)
+            seq += 1
+            if not interval and seq % 64 == 0:
+                # Без ограничения скорости уступаем циклу, чтобы успевать читать ответы
+                await asyncio.sleep(0)
+
+        # Ждём опоздавшие ответы, оставшиеся в pending считаются потерянными
+        wait_until = time.perf_counter() + drain_timeout
+        while protocol.pending and time.perf_counter() < wait_until:
+            await asyncio.sleep(0.01)
+    finally:
+        transport.close()
+    return seq, protocol
+
+
+async def run_udp(args):
+    interval = 1 / args.rate if args.rate else 0
+    size = max(args.size, UDP_HEADER.size)
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    results = await asyncio.gather(*(udp_sender(args.host, args.port, size, interval, deadline, args.drain_timeout,
+                                                args.window)
+                                     for _ in range(args.connections)))
+    elapsed = time.perf_counter() - started
+
+    sent = sum(count for count, _ in results)
+    received = sum(protocol.received for _, protocol in results)
+    if sent and not received:
+        # Без ответов отчёт из одних null выглядел бы как результат; скорее всего сервер не запущен или упал
+        raise ConnectionError(f"Ни одного ответа на {sent} датаграмм от {args.host}:{args.port}")
+    latencies = [value for _, protocol in results for value in protocol.latencies]
+    return summarize('udp', args, elapsed, sent, received, latencies, received * size)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест эхо-серверов из Задания 2")
+    parser.add_argument('proto', choices=['tcp', 'udp'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=65432)
+    parser.add_argument('-c', '--connections', type=int, default=10, help="TCP соединений или UDP отправителей")
+    parser.add_argument('-s', '--size', type=int, default=64, help="размер сообщения в байтах")
+    parser.add_argument('-r', '--rate', type=float, default=0, help="сообщений в секунду на соединение, 0 - без ограничения")
+    parser.add_argument('-d', '--duration', type=float, default=10.0)
+    parser.add_argument('--framed', action='store_true', help="TCP кадры с заголовком длины (сервер с --framed)")
+    parser.add_argument('--timeout', type=float, default=5.0, help="сколько ждать TCP ответ, после - ошибка")
+    parser.add_argument('--drain-timeout', type=float, default=1.0, help="сколько ждать опоздавшие UDP ответы")
+    parser.add_argument('-w', '--window', type=int, default=256,
+                        help="UDP запросов в полёте на отправителя без ограничения скорости")
+    parser.add_argument('-o', '--output', help="файл для результатов в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runner = run_tcp if args.proto == 'tcp' else run_udp
+    try:
+        result = asyncio.run(runner(args))
+    except ConnectionError as e:
+        sys.exit(f"Ошибка: {e}")
+
+    text = json.dumps(result, indent=4, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"Результаты сохранены в {args.output}", file=sys.stderr)
+    print(text)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import struct
+
+# Кадр: 4 байта длины (big-endian) + полезная нагрузка
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class FrameTooLarge(ValueError):
+    pass
+
+
+def pack_frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+
+def pack_frames(payloads):
+    # Несколько кадров одним буфером, чтобы отправить их одним sendall
+    parts = []
+    for payload in payloads:
+        parts.append(HEADER.pack(len(payload)))
+        parts.append(payload)
+    return b''.join(parts)
+
+
+# Чтение кадров через recv_into в заранее выделенный буфер
+class FrameReader:
+    def __init__(self, sock, buffer_size=65536, max_frame_size=MAX_FRAME_SIZE):
+        self.sock = sock
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def _make_room(self, needed):
+        pending = self.end - self.start
+        if needed > len(self.buffer):
+            # Кадр больше буфера: выделяем новый, старые memoryview остаются валидными
+            size = len(self.buffer)
+            while size < needed:
+                size *= 2
+            buffer = bytearray(size)
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        else:
+            self.view[:pending] = self.view[self.start:self.end]
+        self.start = 0
+        self.end = pending
+
+    def _ensure(self, count):
+        if self.start == self.end:
+            self.start = self.end = 0
+        while self.end - self.start < count:
+            if self.start + count > len(self.buffer):
+                self._make_room(count)
+            received = self.sock.recv_into(self.view[self.end:])
+            if not received:
+                if self.end == self.start:
+                    raise EOFError("Соединение закрыто")
+                raise ConnectionError("Соединение закрыто посреди кадра")
+            self.end += received
+
+    def read_frame(self):
+        # Возвращает memoryview, действительный до следующего вызова read_frame
+        self._ensure(HEADER.size)
+        (length,) = HEADER.unpack_from(self.buffer, self.start)
+        if length > self.max_frame_size:
+            raise FrameTooLarge(f"Кадр {length} байт превышает лимит {self.max_frame_size}")
+        self._ensure(HEADER.size + length)
+        begin = self.start + HEADER.size
+        self.start = begin + length
+        return self.view[begin:self.start]
+
+
+async def read_frame_async(reader, max_frame_size=MAX_FRAME_SIZE):
+    header = await reader.readexactly(HEADER.size)
+    (length,) = HEADER.unpack(header)
+    if length > max_frame_size:
+        raise FrameTooLarge(f"Кадр {length} байт превышает лимит {max_frame_size}")
+    return header, await reader.readexactly(length)
@@ -0,0 +1,230 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+LAB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Лаба № 3.py')
+
+# Замер конвейера Лабы № 3 по этапам: create_database -> fetch_posts -> save_posts_to_db -> get_posts_by_user.
+# Каждый прогон идёт в отдельном процессе со своей базой и HTTP кэшем, поэтому пиковый RSS и кэши не смешиваются:
+#   python "Задание 3/bench.py" --sizes 100 10000 1000000 -o results.csv
+DEFAULT_SIZES = (100, 10000, 1000000)
+INSERT_MODES = ('batched', 'per-row', 'pipeline')
+INDEX_MODES = ('indexed', 'bare')
+
+CSV_FIELDS = ('size', 'inserts', 'indexes', 'repeat', 'rows', 'changed', 'create_s', 'fetch_s', 'save_s',
+              'queries', 'query_cold_s', 'query_warm_s', 'peak_rss_mb', 'error')
+
+
+def peak_rss_mb():
+    # VmHWM - пик именно этого процесса; ru_maxrss на Linux наследует пик родителя через fork/exec,
+    # а в родителе работает сервер со всем набором данных
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is not None:
+        value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss в килобайтах, на macOS - в байтах
+        return round(value / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+
+
+def load_lab():
+    spec = importlib.util.spec_from_file_location('lab3', LAB_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def drop_indexes(conn):
+    # Без индекса по user_id и без полнотекстового индекса с его триггерами
+    conn.executescript('''
+    DROP INDEX IF EXISTS idx_posts_user_id;
+    DROP TRIGGER IF EXISTS posts_fts_insert;
+    DROP TRIGGER IF EXISTS posts_fts_delete;
+    DROP TRIGGER IF EXISTS posts_fts_update;
+    DROP TABLE IF EXISTS posts_fts;
+    ''')
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def run_worker(args):
+    # Один прогон в текущем каталоге (его задаёт родительский процесс)
+    lab = load_lab()
+    from common.db import get_connection
+    from common.http_client import configure
+    from common.repository import get_repository
+
+    configure(args.base_url)
+    result = {'inserts': args.inserts, 'indexes': args.indexes}
+
+    _, result['create_s'] = timed(lab.create_database)
+    if args.indexes == 'bare':
+        drop_indexes(get_connection())
+
+    if args.inserts == 'pipeline':
+        # Загрузка и запись идут одновременно, время обеих стадий - в save_s
+        stats, result['save_s'] = timed(lab.fetch_and_save_posts)
+        result['fetch_s'] = None
+        result['rows'] = stats.rows
+    else:
+        posts, result['fetch_s'] = timed(lab.fetch_posts)
+        result['rows'] = len(posts)
+        if args.inserts == 'batched':
+            stats, result['save_s'] = timed(lab.save_posts_to_db, posts)
+        else:
+            # Каждая строка - отдельный INSERT в своей транзакции
+            stats, result['save_s'] = timed(get_repository().save, posts, batch_size=1, batches_per_transaction=1)
+        del posts
+    result['changed'] = stats.changed
+
+    user_ids = [row[0] for row in get_connection().execute(
+        'SELECT DISTINCT user_id FROM posts ORDER BY user_id LIMIT ?', (args.queries,))]
+    result['queries'] = len(user_ids)
+    # Первый проход читает SQLite, второй попадает в кэш репозитория
+    for key in ('query_cold_s', 'query_warm_s'):
+        started = time.perf_counter()
+        for user_id in user_ids:
+            lab.get_posts_by_user(user_id)
+        result[key] = time.perf_counter() - started
+
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_scenario(args, base_url, size, inserts, indexes, repeat):
+    with tempfile.TemporaryDirectory(prefix='lab3-bench-') as directory:
+        env = dict(os.environ, POSTS_HTTP_CACHE=os.path.join(directory, 'http'))
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--base-url', base_url,
+                   '--inserts', inserts, '--indexes', indexes, '--queries', str(args.queries)]
+        process = subprocess.run(command, cwd=directory, env=env, capture_output=True, text=True)
+
+    record = {'size': size, 'inserts': inserts, 'indexes': indexes, 'repeat': repeat}
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        record['error'] = lines[-1] if lines else f'код выхода {process.returncode}'
+        return record
+    record.update(json.loads(process.stdout.strip().splitlines()[-1]))
+    if size is None:
+        # Внешний API: размер набора - сколько постов он вернул
+        record['size'] = record['rows']
+    for key in ('create_s', 'fetch_s', 'save_s', 'query_cold_s', 'query_warm_s'):
+        if record[key] is not None:
+            record[key] = round(record[key], 6)
+    return record
+
+
+def run_size(args, size, results):
+    if args.base_url:
+        base_url, stop = args.base_url, None
+    else:
+        from common.stub_server import start_in_thread
+        print(f"Генерация {size} постов для локального сервера...", file=sys.stderr)
+        _, base_url, stop = start_in_thread(size, latency=args.latency / 1000)
+    try:
+        for inserts in args.inserts:
+            for indexes in args.indexes:
+                for repeat in range(1, args.repeat + 1):
+                    record = run_scenario(args, base_url, size, inserts, indexes, repeat)
+                    results.append(record)
+                    print(format_record(record), file=sys.stderr)
+    finally:
+        if stop is not None:
+            stop()
+
+
+def format_record(record):
+    head = f"{str(record['size']):>8} {record['inserts']:<8} {record['indexes']:<8}"
+    if 'error' in record:
+        return f"{head} ошибка: {record['error']}"
+    fetch = '-' if record['fetch_s'] is None else f"{record['fetch_s']:.3f}"
+    return (f"{head} create {record['create_s']:.3f} с, fetch {fetch} с, "
+            f"save {record['save_s']:.3f} с, запросы {record['query_cold_s']:.4f}/{record['query_warm_s']:.4f} с, "
+            f"RSS {record['peak_rss_mb']} МБ")
+
+
+def write_results(results, path, output_format):
+    if output_format == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
+        return
+    document = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(document, indent=4, ensure_ascii=False) + '\n')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера Лабы № 3 по этапам")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="число постов")
+    parser.add_argument('--inserts', nargs='+', choices=INSERT_MODES, default=list(INSERT_MODES))
+    parser.add_argument('--indexes', nargs='+', choices=INDEX_MODES, default=list(INDEX_MODES))
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--queries', type=int, default=100, help="сколько пользователей запрашивать")
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка локального сервера, мс")
+    parser.add_argument('--base-url', help="готовый API вместо локального сервера, --sizes тогда не влияет")
+    parser.add_argument('-o', '--output', help="файл результатов, .csv или .json")
+    parser.add_argument('--format', choices=('json', 'csv'), help="по умолчанию - по расширению файла")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.worker:
+        args.inserts, args.indexes = args.inserts[0], args.indexes[0]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        run_worker(args)
+        return None
+
+    results = []
+    for size in ([None] if args.base_url else args.sizes):
+        run_size(args, size, results)
+
+    if args.output:
+        output_format = args.format or ('csv' if args.output.endswith('.csv') else 'json')
+        write_results(results, args.output, output_format)
+        print(f"Результаты сохранены в {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(results, indent=4, ensure_ascii=False))
+    return results
+
+
+if __name__ == "__main__":
+    main()
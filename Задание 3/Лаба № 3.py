@@ -1,62 +1,81 @@
-import sqlite3
+import argparse
+import os
+import sys
+
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.db import get_connection
+from common.http_client import configure_from_argv, get_client
+from common.instrument import enable_from_argv, timed
+from common.pipeline import PipelineIngest
+from common.repository import get_repository
+from common.schema import migrate
+from common.snapshot import export_snapshot, restore_snapshot
+
 # 1
+# Таблица posts, индекс по user_id и полнотекстовый индекс - см. common/schema.py
 def create_database():
-    conn = sqlite3.connect('posts.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS posts (
-        id INTEGER PRIMARY KEY,
-        user_id INTEGER,
-        title TEXT,
-        body TEXT
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    migrate(get_connection())
 
 # 2
+@timed('fetch_posts', 'network')
 def fetch_posts():
-    url = 'https://jsonplaceholder.typicode.com/posts'
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print("Ошибка при получении данных:", response.status_code)
+    # Через кэш: пока данные свежие, запроса нет, потом - условный GET с ответом 304
+    try:
+        return get_client().get_cached('posts').json()
+    except requests.HTTPError as e:
+        print("Ошибка при получении данных:", e.response.status_code)
         return []
 
 # 3
+# posts может быть генератором: запись идёт пачками upsert в явных транзакциях
+@timed('save_posts_to_db', 'db')
 def save_posts_to_db(posts):
-    conn = sqlite3.connect('posts.db')
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM posts')
-    for post in posts:
+    return get_repository().save(posts)
 
-        cursor.execute('''
-        INSERT INTO posts (id, user_id, title, body)
-        VALUES (?, ?, ?, ?)
-        ''', (post['id'], post['userId'], post['title'], post['body']))
-    
-    conn.commit()
-    conn.close()
+# 2-3 конвейером: страницы скачиваются параллельно, разбираются в пуле процессов, пишутся одним потоком.
+# Память ограничена очередями между стадиями, а не размером ответа
+@timed('fetch_and_save_posts', 'db')
+def fetch_and_save_posts(page_size=1000, fetch_workers=4, decode_processes=None):
+    return PipelineIngest(page_size=page_size, fetch_workers=fetch_workers,
+                          decode_processes=decode_processes).run()
 
 # 4
+# Повторные запросы по тому же пользователю отдаются из кэша репозитория без обращения к SQLite
 def get_posts_by_user(user_id):
-    conn = sqlite3.connect('posts.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM posts WHERE user_id = ?', (user_id,))
-    posts = cursor.fetchall()
-    conn.close()
-    
-    return posts
+    return get_repository().by_user(user_id)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Загрузка постов в posts.db")
+    parser.add_argument('--pipeline', action='store_true', help="загрузка конвейером по страницам")
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--fetch-workers', type=int, default=4, help="одновременных запросов страниц")
+    parser.add_argument('--decode-processes', type=int, default=None,
+                        help="процессов разбора JSON, по умолчанию ядер минус одно, 0 - без пула")
+    parser.add_argument('--from-snapshot', metavar='FILE', help="загрузить посты из снимка вместо API")
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help="после загрузки записать снимок базы и читать запросы из него")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
+    # --base-url или POSTS_API_URL - другой адрес API, например локальный common/stub_server.py;
+    # --trace/--profile или LAB_TRACE/LAB_PROFILE - замеры, см. common/instrument.py
+    args = parse_args(enable_from_argv(configure_from_argv()))
     create_database()
-    posts = fetch_posts()
-    save_posts_to_db(posts)
+    if args.from_snapshot:
+        stats = restore_snapshot(args.from_snapshot)
+    elif args.pipeline:
+        stats = fetch_and_save_posts(args.page_size, args.fetch_workers, args.decode_processes)
+    else:
+        posts = fetch_posts()
+        stats = save_posts_to_db(posts)
+    print("Сохранено:", stats)
+    if args.snapshot:
+        print("Снимок:", export_snapshot(args.snapshot), "постов в", args.snapshot)
+        # Снимок только что записан из базы и совпадает с ней: запросы читают его через mmap
+        get_repository().use_snapshot(args.snapshot)
     
     user_id = 1
     user_posts = get_posts_by_user(user_id)
@@ -1,37 +1,40 @@
-import sys
+import os
 import sqlite3
+import sys
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
     QTableView, QLineEdit, QPushButton, QMessageBox, QFormLayout, QDialog, QSpinBox, QTextEdit, QDialogButtonBox
 )
-from PyQt5.QtSql import QSqlDatabase, QSqlTableModel
+from PyQt5.QtCore import pyqtSlot
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.db import get_manager
+from common.deletes import last_delete
+from common.instrument import enable_from_argv, timed
+from common.qt_posts import DatabaseOpenWorker, DebouncedSearch, LazyPostsModel, SearchResultsModel
+from common.repository import get_repository
+from common.schema import migrate
+from common.startup import after_first_paint, finished, mark, measure_from_argv
 
 
 # БД
 def initialize_database():
-    connection = sqlite3.connect("posts.db")
-    cursor = connection.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS posts (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            title TEXT,
-            body TEXT
-        );
-    """)
-    # Test
-    cursor.execute("SELECT COUNT(*) FROM posts")
-    if cursor.fetchone()[0] == 0:
-        cursor.executemany("""
-            INSERT INTO posts (user_id, title, body)
-            VALUES (?, ?, ?)
-        """, [
-            (1, "First Post", "This is the first test post."),
-            (2, "Second Post", "This is another test post."),
-            (3, "Hello World", "Hello, this is a sample post!")
-        ])
-    connection.commit()
-    connection.close()
+    connection = get_manager("posts.db").connection()
+    migrate(connection)
+    with connection:
+        cursor = connection.cursor()
+        # Test
+        cursor.execute("SELECT COUNT(*) FROM posts")
+        if cursor.fetchone()[0] == 0:
+            cursor.executemany("""
+                INSERT INTO posts (user_id, title, body)
+                VALUES (?, ?, ?)
+            """, [
+                (1, "First Post", "This is the first test post."),
+                (2, "Second Post", "This is another test post."),
+                (3, "Hello World", "Hello, this is a sample post!")
+            ])
 
 
 # Главное окно
@@ -41,14 +44,20 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("SQLite GUI на PyQt")
         self.resize(800, 600)
 
-        # Подключение к базе
-        self.database = self.connect_to_db()
-        self.model = self.create_model()
+        # База открывается после первой отрисовки окна, см. open_database
+        self.model = None
+        self.open_worker = None
+
+        # Поиск идёт в фоне после паузы в наборе, результаты показываются в отдельной модели
+        self.search_model = SearchResultsModel(self)
+        self.search = DebouncedSearch("posts.db", self.search_model, "title", parent=self)
 
         # Все элементы интерфейса(почти)
         self.table_view = QTableView()
-        self.table_view.setModel(self.model)
-        self.table_view.resizeColumnsToContents()
+        # Пока база открывается, видны только заголовки колонок
+        self.table_view.setModel(self.search_model)
+        # Ширина колонок по первым строкам, а не по всей таблице
+        self.table_view.horizontalHeader().setResizeContentsPrecision(100)
 
         self.search_field = QLineEdit()
         self.search_field.setPlaceholderText("Поиск по заголовку...")
@@ -56,6 +65,7 @@ class MainWindow(QMainWindow):
         self.refresh_button = QPushButton("Обновить")
         self.add_button = QPushButton("Добавить")
         self.delete_button = QPushButton("Удалить")
+        self.undo_button = QPushButton("Отменить")
 
         main_layout = QVBoxLayout()
         button_layout = QHBoxLayout()
@@ -65,6 +75,7 @@ class MainWindow(QMainWindow):
         button_layout.addWidget(self.refresh_button)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.delete_button)
+        button_layout.addWidget(self.undo_button)
         main_layout.addLayout(button_layout)
 
         container = QWidget()
@@ -74,33 +85,57 @@ class MainWindow(QMainWindow):
         self.refresh_button.clicked.connect(self.refresh_table)
         self.add_button.clicked.connect(self.open_add_dialog)
         self.delete_button.clicked.connect(self.delete_selected_record)
+        self.undo_button.clicked.connect(self.undo_last_delete)
         self.search_field.textChanged.connect(self.search_records)
 
-    def connect_to_db(self):
-        db = QSqlDatabase.addDatabase("QSQLITE")
-        db.setDatabaseName("posts.db")
-        if not db.open():
-            QMessageBox.critical(self, "Ошибка", "Не удалось подключиться к базе данных.")
-            sys.exit(1)
-        return db
-
-    def create_model(self):
-        model = QSqlTableModel()
-        model.setTable("posts")
-        model.select()
-        model.setHeaderData(0, 0, "ID")
-        model.setHeaderData(1, 0, "User ID")
-        model.setHeaderData(2, 0, "Title")
-        model.setHeaderData(3, 0, "Body")
-        return model
-
+        self.set_database_ready(False)
+        self.statusBar().showMessage("Открытие базы данных...")
+        after_first_paint(self, self.open_database)
+
+    def set_database_ready(self, ready):
+        for widget in (self.search_field, self.refresh_button, self.add_button, self.delete_button):
+            widget.setEnabled(ready)
+        self.undo_button.setEnabled(False)
+
+    def open_database(self):
+        mark('first_frame')
+        self.open_worker = DatabaseOpenWorker("posts.db", initialize_database)
+        self.open_worker.opened.connect(self.on_database_opened)
+        self.open_worker.failed.connect(self.on_database_failed)
+        self.open_worker.start()
+
+    def on_database_opened(self, row_count, can_undo):
+        self.open_worker.wait()
+        self.model = self.create_model(row_count)
+        self.table_view.setModel(self.model)
+        self.table_view.resizeColumnsToContents()
+        self.set_database_ready(True)
+        self.undo_button.setEnabled(can_undo)
+        self.statusBar().clearMessage()
+        finished(QApplication.quit)
+
+    def on_database_failed(self, message):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось открыть базу данных: {message}")
+        QApplication.exit(1)
+
+    def create_model(self, row_count=None):
+        # Строки подгружаются блоками при прокрутке, заголовки колонок задаёт сама модель
+        return LazyPostsModel("posts.db", parent=self, row_count=row_count)
+
+    # pyqtSlot() - обёртке замера не передаётся аргумент checked от clicked
+    @pyqtSlot()
+    @timed('refresh_table', 'gui')
     def refresh_table(self):
-        self.model.select()
+        self.model.refresh()
+        if self.search.text:
+            self.search.run_now()
 
     def open_add_dialog(self):
         dialog = AddDialog(self)
         if dialog.exec_() == QDialog.Accepted:
-            self.refresh_table()
+            self.model.insert_ids([dialog.inserted_id])
+            if self.search.text:
+                self.search.run_now()
 
     def delete_selected_record(self):
         selected = self.table_view.selectionModel().selectedRows()
@@ -113,15 +148,33 @@ class MainWindow(QMainWindow):
             QMessageBox.Yes | QMessageBox.No
         )
         if confirmation == QMessageBox.Yes:
-            for index in selected:
-                self.model.removeRow(index.row())
-            self.model.submitAll()
-            self.refresh_table()
-
+            # Удаляем по id одной транзакцией, удалённые строки остаются в журнале для отмены
+            ids = [self.table_view.model().row_id(index.row()) for index in selected]
+            _, deleted = get_repository("posts.db").delete(ids)
+            self.model.remove_ids(ids)
+            self.search_model.remove_ids(ids)
+            self.undo_button.setEnabled(True)
+            self.statusBar().showMessage(f"Удалено записей: {deleted}")
+
+    def undo_last_delete(self):
+        repository = get_repository("posts.db")
+        ids = repository.undo_delete()
+        self.model.insert_ids(ids)
+        if self.search.text:
+            self.search.run_now()
+        self.undo_button.setEnabled(last_delete(repository.connection()) is not None)
+        self.statusBar().showMessage(f"Восстановлено записей: {len(ids)}")
+
+    @timed('search_records', 'gui')
     def search_records(self, text):
-        filter_str = f"title LIKE '%{text}%'"
-        self.model.setFilter(filter_str)
-        self.model.select()
+        self.table_view.setModel(self.search_model if text else self.model)
+        self.search.set_text(text)
+
+    def closeEvent(self, event):
+        if self.open_worker is not None:
+            self.open_worker.wait()
+        self.search.shutdown()
+        super().closeEvent(event)
 
 
 # ДОБАВИТЬ
@@ -158,28 +211,23 @@ class AddDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Все поля должны быть заполнены.")
             return
 
-        db = QSqlDatabase.database()
-        if not db.isOpen():
-            QMessageBox.critical(self, "Ошибка", "База данных не подключена.")
-            return
-
-        query = db.exec(
-            f"""
-            INSERT INTO posts (user_id, title, body)
-            VALUES ({user_id}, '{title}', '{body}');
-            """
-        )
-        if not query.isActive():
-            QMessageBox.critical(self, "Ошибка", f"Не удалось добавить запись: {query.lastError().text()}")
+        # Значения передаются параметрами, кавычки в тексте больше не ломают запрос
+        try:
+            self.inserted_id = get_repository("posts.db").add(user_id, title, body)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось добавить запись: {e}")
             return
 
         super().accept()
 
 def main():
-    initialize_database()
-    app = QApplication(sys.argv)
+    # --startup [N] - замер холодного старта, см. common/startup.py
+    argv = [sys.argv[0]] + enable_from_argv(measure_from_argv(sys.argv[1:]))
+    mark('main')
+    app = QApplication(argv)
     window = MainWindow()
     window.show()
+    mark('window')
     sys.exit(app.exec_())
 
 
@@ -1,49 +1,57 @@
-import sys
+import os
 import sqlite3
-import requests
+import sys
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
     QTableView, QLineEdit, QPushButton, QMessageBox, QFormLayout,
     QDialog, QSpinBox, QTextEdit, QDialogButtonBox, QProgressBar
 )
-from PyQt5.QtSql import QSqlDatabase, QSqlTableModel
-from PyQt5.QtCore import QTimer, QThread, pyqtSignal
+from PyQt5.QtCore import QTimer, QThread, pyqtSignal, pyqtSlot
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.db import get_manager
+from common.http_client import configure_from_argv
+from common.deletes import last_delete
+from common.instrument import enable_from_argv, timed
+from common.qt_posts import DatabaseOpenWorker, DebouncedSearch, LazyPostsModel, SearchResultsModel
+from common.repository import get_repository
+from common.schema import migrate
+from common.startup import after_first_paint, finished, mark, measure_from_argv
+from common.sync import AdaptiveInterval, IncrementalSync, SyncInterrupted
 
 
 # БД
 def initialize_database():
-    connection = sqlite3.connect("posts.db")
-    cursor = connection.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS posts (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            title TEXT,
-            body TEXT
-        );
-    """)
-    connection.commit()
-    connection.close()
+    migrate(get_manager("posts.db").connection())
 
 
 # Загрузка на фоне
+# Ответ читается чанками и разбирается по ходу, посты пишутся в базу пачками прямо из этого потока
 class BackgroundWorker(QThread):
     progress = pyqtSignal(int)
-    data_loaded = pyqtSignal(list)
+    batch_saved = pyqtSignal(int)
+    data_loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, sync, force=False):
+        super().__init__()
+        self.sync = sync
+        self.force = force
 
     def run(self):
+        # requests нужен только здесь, при старте окна он не загружается
+        import requests
         try:
-            response = requests.get("https://jsonplaceholder.typicode.com/posts", timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            for i, _ in enumerate(data, 1):
-                QThread.msleep(50)  # Задержка для симуляции загрузки
-                self.progress.emit(int(i / len(data) * 100))
-
-            self.data_loaded.emit(data)
-        except requests.RequestException as e:
-            QMessageBox.critical(None, "Ошибка", f"Ошибка загрузки данных: {str(e)}")
+            result = self.sync.run(self.force, progress=self.progress.emit, on_batch=self.batch_saved.emit,
+                                   interrupted=self.isInterruptionRequested)
+        except SyncInterrupted:
+            return
+        except (requests.RequestException, ValueError) as e:
+            self.failed.emit(str(e))
+            return
+        self.progress.emit(100)
+        self.data_loaded.emit(result)
 
 
 # Главное окно
@@ -53,14 +61,20 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("SQLite GUI на PyQt")
         self.resize(800, 600)
 
-        # Подключение к базе
-        self.database = self.connect_to_db()
-        self.model = self.create_model()
+        # База открывается после первой отрисовки окна, см. open_database
+        self.model = None
+        self.open_worker = None
+
+        # Поиск идёт в фоне после паузы в наборе, результаты показываются в отдельной модели
+        self.search_model = SearchResultsModel(self)
+        self.search = DebouncedSearch("posts.db", self.search_model, "title", parent=self)
 
         # Все элементы интерфейса(почти)
         self.table_view = QTableView()
-        self.table_view.setModel(self.model)
-        self.table_view.resizeColumnsToContents()
+        # Пока база открывается, видны только заголовки колонок
+        self.table_view.setModel(self.search_model)
+        # Ширина колонок по первым строкам, а не по всей таблице
+        self.table_view.horizontalHeader().setResizeContentsPrecision(100)
 
         self.search_field = QLineEdit()
         self.search_field.setPlaceholderText("Поиск по заголовку...")
@@ -68,6 +82,7 @@ class MainWindow(QMainWindow):
         self.refresh_button = QPushButton("Обновить")
         self.add_button = QPushButton("Добавить")
         self.delete_button = QPushButton("Удалить")
+        self.undo_button = QPushButton("Отменить")
         self.load_button = QPushButton("Загрузить данные")
         self.progress_bar = QProgressBar()
 
@@ -79,6 +94,7 @@ class MainWindow(QMainWindow):
         button_layout.addWidget(self.refresh_button)
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.delete_button)
+        button_layout.addWidget(self.undo_button)
         button_layout.addWidget(self.load_button)
         main_layout.addLayout(button_layout)
         main_layout.addWidget(self.progress_bar)
@@ -90,40 +106,77 @@ class MainWindow(QMainWindow):
         self.refresh_button.clicked.connect(self.refresh_table)
         self.add_button.clicked.connect(self.open_add_dialog)
         self.delete_button.clicked.connect(self.delete_selected_record)
+        self.undo_button.clicked.connect(self.undo_last_delete)
         self.load_button.clicked.connect(self.load_data)
         self.search_field.textChanged.connect(self.search_records)
 
-        # Таймер до обновления
+        # Синхронизация с API: раз в 30 с, пока данные не меняются, интервал растёт до 10 минут.
+        # Одновременно идёт только один проход, запрошенный во время него ставится в очередь.
+        # Таймер запускается, когда база открыта
+        self.sync = IncrementalSync("posts.db")
+        self.sync_interval = AdaptiveInterval(30000, 600000)
         self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.auto_refresh_data)
-        self.timer.start(30000)
         self.worker_thread = None
-
-    def connect_to_db(self):
-        db = QSqlDatabase.addDatabase("QSQLITE")
-        db.setDatabaseName("posts.db")
-        if not db.open():
-            QMessageBox.critical(self, "Ошибка", "Не удалось подключиться к базе данных.")
-            sys.exit(1)
-        return db
-
-    def create_model(self):
-        model = QSqlTableModel()
-        model.setTable("posts")
-        model.select()
-        model.setHeaderData(0, 0, "ID")
-        model.setHeaderData(1, 0, "User ID")
-        model.setHeaderData(2, 0, "Title")
-        model.setHeaderData(3, 0, "Body")
-        return model
-
+        self.pending_force = None
+        self.last_changed = 0
+        # Пока идёт загрузка, таблица перечитывается не чаще раза в 300 мс
+        self.batch_refresh_timer = QTimer(self)
+        self.batch_refresh_timer.setSingleShot(True)
+        self.batch_refresh_timer.setInterval(300)
+        self.batch_refresh_timer.timeout.connect(self.refresh_table)
+
+        self.set_database_ready(False)
+        self.statusBar().showMessage("Открытие базы данных...")
+        after_first_paint(self, self.open_database)
+
+    def set_database_ready(self, ready):
+        for widget in (self.search_field, self.refresh_button, self.add_button, self.delete_button,
+                       self.load_button):
+            widget.setEnabled(ready)
+        self.undo_button.setEnabled(False)
+
+    def open_database(self):
+        mark('first_frame')
+        self.open_worker = DatabaseOpenWorker("posts.db", initialize_database)
+        self.open_worker.opened.connect(self.on_database_opened)
+        self.open_worker.failed.connect(self.on_database_failed)
+        self.open_worker.start()
+
+    def on_database_opened(self, row_count, can_undo):
+        self.open_worker.wait()
+        self.model = self.create_model(row_count)
+        self.table_view.setModel(self.model)
+        self.table_view.resizeColumnsToContents()
+        self.set_database_ready(True)
+        self.undo_button.setEnabled(can_undo)
+        self.statusBar().clearMessage()
+        self.timer.start(int(self.sync_interval.next(changed=True)))
+        finished(QApplication.quit)
+
+    def on_database_failed(self, message):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось открыть базу данных: {message}")
+        QApplication.exit(1)
+
+    def create_model(self, row_count=None):
+        # Строки подгружаются блоками при прокрутке, заголовки колонок задаёт сама модель
+        return LazyPostsModel("posts.db", parent=self, row_count=row_count)
+
+    # pyqtSlot() - обёртке замера не передаётся аргумент checked от clicked
+    @pyqtSlot()
+    @timed('refresh_table', 'gui')
     def refresh_table(self):
-        self.model.select()
+        self.model.refresh()
+        if self.search.text:
+            self.search.run_now()
 
     def open_add_dialog(self):
         dialog = AddDialog(self)
         if dialog.exec_() == QDialog.Accepted:
-            self.refresh_table()
+            self.model.insert_ids([dialog.inserted_id])
+            if self.search.text:
+                self.search.run_now()
 
     def delete_selected_record(self):
         selected = self.table_view.selectionModel().selectedRows()
@@ -136,47 +189,90 @@ class MainWindow(QMainWindow):
             QMessageBox.Yes | QMessageBox.No
         )
         if confirmation == QMessageBox.Yes:
-            for index in selected:
-                self.model.removeRow(index.row())
-            self.model.submitAll()
-            self.refresh_table()
-
+            # Удаляем по id одной транзакцией, удалённые строки остаются в журнале для отмены
+            ids = [self.table_view.model().row_id(index.row()) for index in selected]
+            _, deleted = get_repository("posts.db").delete(ids)
+            self.model.remove_ids(ids)
+            self.search_model.remove_ids(ids)
+            self.undo_button.setEnabled(True)
+            self.statusBar().showMessage(f"Удалено записей: {deleted}")
+
+    def undo_last_delete(self):
+        repository = get_repository("posts.db")
+        ids = repository.undo_delete()
+        self.model.insert_ids(ids)
+        if self.search.text:
+            self.search.run_now()
+        self.undo_button.setEnabled(last_delete(repository.connection()) is not None)
+        self.statusBar().showMessage(f"Восстановлено записей: {len(ids)}")
+
+    @timed('search_records', 'gui')
     def search_records(self, text):
-        filter_str = f"title LIKE '%{text}%'"
-        self.model.setFilter(filter_str)
-        self.model.select()
+        self.table_view.setModel(self.search_model if text else self.model)
+        self.search.set_text(text)
 
+    @pyqtSlot()
+    @timed('load_data', 'gui')
     def load_data(self):
+        self.start_loading(force=True)
+
+    def start_loading(self, force):
         if self.worker_thread is not None and self.worker_thread.isRunning():
-            QMessageBox.information(self, "Информация", "Загрузка уже выполняется.")
+            # Следующий проход начнётся сразу после текущего, полная загрузка важнее обычной
+            self.pending_force = bool(self.pending_force) or force
             return
 
-        self.worker_thread = BackgroundWorker()
+        self.timer.stop()
+        self.last_changed = 0
+        self.worker_thread = BackgroundWorker(self.sync, force)
         self.worker_thread.progress.connect(self.progress_bar.setValue)
-        self.worker_thread.data_loaded.connect(self.save_data)
+        self.worker_thread.batch_saved.connect(self.on_batch_saved)
+        self.worker_thread.data_loaded.connect(self.on_data_loaded)
+        self.worker_thread.failed.connect(self.on_load_failed)
+        self.worker_thread.finished.connect(self.on_sync_finished)
         self.worker_thread.start()
 
-    def save_data(self, data):
-        connection = sqlite3.connect("posts.db")
-        cursor = connection.cursor()
+    def on_batch_saved(self, changed):
+        if not self.batch_refresh_timer.isActive():
+            self.batch_refresh_timer.start()
 
-        for post in data:
-            cursor.execute("""
-                INSERT OR IGNORE INTO posts (id, user_id, title, body)
-                VALUES (?, ?, ?, ?)
-            """, (post["id"], post["userId"], post["title"], post["body"]))
+    def on_data_loaded(self, result):
+        self.batch_refresh_timer.stop()
+        self.last_changed = result.changed
+        if result.changed:
+            self.refresh_table()
+        self.statusBar().showMessage(str(result))
 
-        connection.commit()
-        connection.close()
+    def on_load_failed(self, message):
+        self.batch_refresh_timer.stop()
         self.refresh_table()
+        if self.worker_thread.force:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки данных: {message}")
+        else:
+            self.statusBar().showMessage(f"Ошибка синхронизации: {message}")
+
+    def on_sync_finished(self):
+        self.worker_thread.wait()
+        if self.pending_force is not None:
+            force, self.pending_force = self.pending_force, None
+            self.start_loading(force)
+        else:
+            self.timer.start(int(self.sync_interval.next(self.last_changed > 0)))
 
     def auto_refresh_data(self):
-        self.load_data()
+        self.start_loading(force=False)
 
     def closeEvent(self, event):
+        if self.open_worker is not None:
+            self.open_worker.wait()
+        self.timer.stop()
+        self.pending_force = None
+        self.search.shutdown()
         if self.worker_thread is not None:
-            self.worker_thread.quit()
+            self.worker_thread.finished.disconnect(self.on_sync_finished)
+            self.worker_thread.requestInterruption()
             self.worker_thread.wait()
+            self.worker_thread = None
         super().closeEvent(event)
 
 
@@ -214,29 +310,24 @@ class AddDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Все поля должны быть заполнены.")
             return
 
-        db = QSqlDatabase.database()
-        if not db.isOpen():
-            QMessageBox.critical(self, "Ошибка", "База данных не подключена.")
-            return
-
-        query = db.exec(
-            f"""
-            INSERT INTO posts (user_id, title, body)
-            VALUES ({user_id}, '{title}', '{body}');
-            """
-        )
-        if not query.isActive():
-            QMessageBox.critical(self, "Ошибка", f"Не удалось добавить запись: {query.lastError().text()}")
+        # Значения передаются параметрами, кавычки в тексте больше не ломают запрос
+        try:
+            self.inserted_id = get_repository("posts.db").add(user_id, title, body)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось добавить запись: {e}")
             return
 
         super().accept()
 
 
 def main():
-    initialize_database()
-    app = QApplication(sys.argv)
+    # --startup [N] - замер холодного старта, см. common/startup.py
+    argv = [sys.argv[0]] + enable_from_argv(configure_from_argv(measure_from_argv(sys.argv[1:])))
+    mark('main')
+    app = QApplication(argv)
     window = MainWindow()
     window.show()
+    mark('window')
     sys.exit(app.exec_())
 
 
@@ -1,11 +1,46 @@
+import os
+import re
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout,
-    QFileDialog, QComboBox, QLineEdit, QHBoxLayout, QWidget
+    QFileDialog, QComboBox, QLineEdit, QHBoxLayout, QWidget, QProgressBar, QCheckBox
 )
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.instrument import enable_from_argv, span, timed, wrap_method
+from common.startup import after_first_paint, finished, mark, measure_from_argv
+
+# numpy, pandas и matplotlib (и модули рядом, которые их импортируют) загружаются при первом
+# использовании: окно появляется без них, pandas впервые нужен в потоке чтения CSV
+
+
+# Чтение CSV пачками в фоне, чтобы окно не замирало на больших файлах
+class CsvLoadWorker(QThread):
+    progress = pyqtSignal(int)
+    loaded = pyqtSignal(object, bool)
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_path, use_cache):
+        super().__init__()
+        self.file_path = file_path
+        self.use_cache = use_cache
+
+    def run(self):
+        import pandas as pd
+        from csv_loader import LoadInterrupted, load_csv
+        try:
+            with span('load_csv', 'io', path=self.file_path, use_cache=self.use_cache):
+                data, from_cache = load_csv(self.file_path, progress=self.progress.emit,
+                                            interrupted=self.isInterruptionRequested, use_cache=self.use_cache)
+        except LoadInterrupted:
+            return
+        except (OSError, ValueError, pd.errors.ParserError) as e:
+            self.failed.emit(str(e))
+            return
+        self.loaded.emit(data, from_cache)
+
 
 class DataVisualizationApp(QMainWindow):
     def __init__(self):
@@ -14,18 +49,30 @@ class DataVisualizationApp(QMainWindow):
         self.setGeometry(100, 100, 800, 600)
 
         self.data = None
+        # Номер версии данных: по нему график понимает, что агрегаты устарели
+        self.data_version = 0
+        self.stats = None
+        self.load_worker = None
 
         self.main_widget = QWidget()
         self.layout = QVBoxLayout(self.main_widget)
         self.setCentralWidget(self.main_widget)
 
         self.add_components()
+        after_first_paint(self, self.on_first_frame)
 
     def add_components(self):
         self.load_button = QPushButton("Load CSV")
         self.load_button.clicked.connect(self.load_data)
         self.layout.addWidget(self.load_button)
 
+        self.cache_checkbox = QCheckBox("Use columnar cache")
+        self.cache_checkbox.setChecked(True)
+        self.layout.addWidget(self.cache_checkbox)
+
+        self.progress_bar = QProgressBar()
+        self.layout.addWidget(self.progress_bar)
+
         self.stats_label = QLabel("No data loaded.")
         self.layout.addWidget(self.stats_label)
 
@@ -36,9 +83,11 @@ class DataVisualizationApp(QMainWindow):
         self.chart_type_combo.addItems(["Line Chart", "Histogram", "Pie Chart"])
         self.layout.addWidget(self.chart_type_combo)
 
-        self.figure, self.ax = plt.subplots()
-        self.canvas = FigureCanvas(self.figure)
-        self.layout.addWidget(self.canvas)
+        # График создаётся при первом построении (ensure_chart), до этого на его месте надпись
+        self.figure = self.ax = self.canvas = self.toolbar = self.renderer = None
+        self.chart_placeholder = QLabel("The chart will appear here.")
+        self.chart_placeholder.setAlignment(Qt.AlignCenter)
+        self.layout.addWidget(self.chart_placeholder, 1)
 
         self.add_value_layout = QHBoxLayout()
 
@@ -58,67 +107,136 @@ class DataVisualizationApp(QMainWindow):
         self.plot_button.clicked.connect(self.plot_chart)
         self.layout.addWidget(self.plot_button)
 
+    def on_first_frame(self):
+        mark('first_frame')
+        finished(QApplication.quit)
+
+    def ensure_chart(self):
+        if self.renderer is not None:
+            return
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+        from matplotlib.figure import Figure
+        from chart_render import ChartRenderer
+
+        # Figure без pyplot: окно само владеет фигурой, глобальный список фигур pyplot не нужен
+        self.figure = Figure()
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvas(self.figure)
+        # Сама отрисовка идёт позже, в draw() из цикла событий, поэтому замеряется отдельно от plot_chart
+        wrap_method(self.canvas, 'draw', 'canvas.draw', 'gui')
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        index = self.layout.indexOf(self.chart_placeholder)
+        self.layout.insertWidget(index, self.toolbar)
+        self.layout.insertWidget(index + 1, self.canvas, 1)
+        self.layout.removeWidget(self.chart_placeholder)
+        self.chart_placeholder.deleteLater()
+        self.chart_placeholder = None
+        self.renderer = ChartRenderer(self.ax, self.canvas)
+
+    # pyqtSlot() - обёртке замера не передаётся аргумент checked от clicked
+    @pyqtSlot()
+    @timed('load_data', 'gui')
     def load_data(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", "CSV Files (*.csv)")
-        if file_path:
-            self.data = pd.read_csv(file_path)
-            self.update_stats()
+        if not file_path:
+            return
+        if self.load_worker is not None and self.load_worker.isRunning():
+            self.load_worker.requestInterruption()
+            self.load_worker.wait()
+
+        self.load_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.stats_label.setText(f"Loading {file_path}...")
+        self.load_worker = CsvLoadWorker(file_path, self.cache_checkbox.isChecked())
+        self.load_worker.progress.connect(self.progress_bar.setValue)
+        self.load_worker.loaded.connect(self.on_data_loaded)
+        self.load_worker.failed.connect(self.on_load_failed)
+        self.load_worker.finished.connect(lambda: self.load_button.setEnabled(True))
+        self.load_worker.start()
+
+    def on_data_loaded(self, data, from_cache):
+        from append_buffer import AppendableFrame
+        from column_stats import StatsEngine
+        # Добавленные значения дописываются в буфер, а не через pd.concat
+        self.data = AppendableFrame(data)
+        if self.stats is None:
+            self.stats = StatsEngine()
+        self.data_version += 1
+        self.stats.reset(data)
+        self.progress_bar.setValue(100)
+        self.update_stats()
+        if from_cache:
+            self.statusBar().showMessage("Loaded from columnar cache")
+
+    def on_load_failed(self, message):
+        self.progress_bar.setValue(0)
+        self.stats_label.setText(f"Failed to load file: {message}")
 
     def update_stats(self):
         if self.data is not None:
-            rows, cols = self.data.shape
-            stats = f"Rows: {rows}, Columns: {cols}\n"
-            for col in self.data.columns:
-                if self.data[col].dtype in ['int64', 'float64']:
-                    stats += f"{col}: Min={self.data[col].min()}, Max={self.data[col].max()}\n"
-            self.stats_label.setText(stats)
+            self.stats_label.setText(self.stats.text())
 
+    @pyqtSlot()
+    @timed('plot_chart', 'gui')
     def plot_chart(self):
         if self.data is None:
             self.stats_label.setText("Please load a dataset first.")
             return
 
         chart_type = self.chart_type_combo.currentText()
-        self.ax.clear()
-
-        if chart_type == "Line Chart":
-            if "Date" in self.data.columns and "Value1" in self.data.columns:
-                self.data.plot(x="Date", y="Value1", ax=self.ax)
-            else:
-                self.stats_label.setText("Required columns: Date, Value1.")
-
-        elif chart_type == "Histogram":
-            if "Date" in self.data.columns and "Value2" in self.data.columns:
-                self.ax.bar(self.data["Date"], self.data["Value2"])
-            else:
-                self.stats_label.setText("Required columns: Date, Value2.")
-
-        elif chart_type == "Pie Chart":
-            if "Category" in self.data.columns:
-                self.data["Category"].value_counts().plot.pie(ax=self.ax, autopct='%1.1f%%')
-            else:
-                self.stats_label.setText("Required column: Category.")
+        required = {
+            "Line Chart": ("Date", "Value1"),
+            "Histogram": ("Date", "Value2"),
+            "Pie Chart": ("Category",),
+        }[chart_type]
+        if not all(column in self.data.columns for column in required):
+            noun = "column" if len(required) == 1 else "columns"
+            self.stats_label.setText(f"Required {noun}: {', '.join(required)}.")
+            return
 
-        self.canvas.draw()
+        self.ensure_chart()
+        self.renderer.set_data(self.data, self.data_version)
+        self.renderer.plot(chart_type)
 
     def add_value(self):
+        import numpy as np
         new_value = self.add_value_input.text()
         if not new_value:
             return
 
         try:
-            new_value = float(new_value)
+            # Можно вставить сразу много значений через пробел, запятую или точку с запятой
+            values = np.array([part for part in re.split(r"[\s,;]+", new_value) if part], dtype=np.float64)
+            if not len(values):
+                return
             if "Value1" in self.data.columns:
-                new_row = pd.DataFrame([[new_value]], columns=["Value1"])
-                self.data = pd.concat([self.data, new_row], ignore_index=True)
+                if len(values) == 1:
+                    self.data.append({"Value1": values[0]})
+                    self.stats.append({"Value1": values[0]})
+                else:
+                    self.data.append_many({"Value1": values}, len(values))
+                    self.stats.append_many({"Value1": values}, len(values))
+                self.data_version += 1
                 self.update_stats()
             else:
                 self.stats_label.setText("Cannot add value: 'Value1' column missing.")
         except ValueError:
             self.stats_label.setText("Invalid input. Please enter a numeric value.")
 
+    def closeEvent(self, event):
+        if self.load_worker is not None:
+            self.load_worker.requestInterruption()
+            self.load_worker.wait()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # --trace/--profile или LAB_TRACE/LAB_PROFILE - замеры, см. common/instrument.py;
+    # --startup [N] - замер холодного старта, см. common/startup.py
+    argv = [sys.argv[0]] + enable_from_argv(measure_from_argv(sys.argv[1:]))
+    mark('main')
+    app = QApplication(argv)
     main_window = DataVisualizationApp()
     main_window.show()
+    mark('window')
     sys.exit(app.exec_())
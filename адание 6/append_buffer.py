@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+MIN_CAPACITY = 1024
+GROWTH = 1.5
+
+
+def column_kind(dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'integer'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float'
+    return 'object'
+
+
+# Столбец с запасом места под добавление. Пока добавлений не было, хранится исходный Series
+# (в том числе отображённый из кэша); при первом добавлении копируется в массив с запасом,
+# дальше массив растёт в GROWTH раз, поэтому добавление в среднем O(1)
+class AppendColumn:
+    def __init__(self, series):
+        self.series = series
+        self.kind = column_kind(series.dtype)
+        self.length = len(series)
+        self.values = None
+        self.mask = None
+        self.categories = series.cat.categories if self.kind == 'category' else None
+
+    def materialize(self, capacity):
+        series = self.series
+        missing = series.isna().to_numpy()
+        if self.kind == 'category':
+            base = series.cat.codes.to_numpy().astype(np.int32)
+        elif self.kind == 'datetime':
+            base = series.to_numpy(dtype='datetime64[ns]')
+        elif self.kind in ('integer', 'bool'):
+            # Пропуски в целых и логических хранятся маской, как в nullable типах pandas
+            dtype = np.bool_ if self.kind == 'bool' else getattr(series.dtype, 'numpy_dtype', series.dtype)
+            base = series.to_numpy(dtype=dtype, na_value=0)
+            self.mask = np.zeros(capacity, dtype=np.bool_)
+            self.mask[:self.length] = missing
+        elif self.kind == 'float':
+            base = series.to_numpy(dtype=getattr(series.dtype, 'numpy_dtype', series.dtype), na_value=np.nan)
+        else:
+            base = series.to_numpy(dtype=object)
+        self.values = np.empty(capacity, dtype=base.dtype)
+        self.values[:self.length] = base
+        self.series = None
+
+    def reserve(self, extra):
+        needed = self.length + extra
+        if self.values is None:
+            self.materialize(max(MIN_CAPACITY, int(needed * GROWTH)))
+        elif needed > self.values.size:
+            capacity = max(needed, int(self.values.size * GROWTH))
+            self.values = np.resize(self.values, capacity)
+            if self.mask is not None:
+                self.mask = np.resize(self.mask, capacity)
+
+    def append_many(self, values, count):
+        self.reserve(count)
+        start, end = self.length, self.length + count
+        if values is None:
+            self.fill_missing(start, end)
+        else:
+            self.assign(start, end, values)
+        self.length = end
+
+    def fill_missing(self, start, end):
+        if self.kind == 'category':
+            self.values[start:end] = -1
+        elif self.kind == 'datetime':
+            self.values[start:end] = np.datetime64('NaT')
+        elif self.mask is not None:
+            self.values[start:end] = 0
+            self.mask[start:end] = True
+        elif self.kind == 'float':
+            self.values[start:end] = np.nan
+        else:
+            self.values[start:end] = None
+
+    def assign(self, start, end, values):
+        if self.kind == 'category':
+            values = pd.Index(values)
+            new = values[~values.isin(self.categories) & values.notna()].unique()
+            if len(new):
+                self.categories = self.categories.append(new)
+            self.values[start:end] = self.categories.get_indexer(values)
+        elif self.kind == 'datetime':
+            self.values[start:end] = pd.to_datetime(values).to_numpy(dtype='datetime64[ns]')
+        elif self.kind == 'integer':
+            values = np.asarray(values, dtype=np.float64)
+            if not np.all(np.isnan(values) | (values == np.round(values))):
+                # Дробные значения в целом столбце: переводим его в float64, как сделал бы concat
+                self.to_float()
+                self.values[start:end] = values
+                return
+            self.widen(values)
+            self.mask[start:end] = np.isnan(values)
+            self.values[start:end] = np.nan_to_num(values)
+        elif self.kind == 'bool':
+            values = pd.array(values, dtype='boolean')
+            self.mask[start:end] = values.isna()
+            self.values[start:end] = values.to_numpy(dtype=np.bool_, na_value=False)
+        else:
+            self.values[start:end] = values
+
+    def widen(self, values):
+        # Столбец сужен по загруженным данным, новое значение может в него не поместиться
+        info = np.iinfo(self.values.dtype)
+        present = values[~np.isnan(values)]
+        if present.size and (present.min() < info.min or present.max() > info.max):
+            self.values = self.values.astype(np.int64)
+
+    def to_float(self):
+        values = self.values.astype(np.float64)
+        values[self.mask] = np.nan
+        self.values = values
+        self.mask = None
+        self.kind = 'float'
+
+    def to_series(self, name):
+        if self.values is None:
+            return self.series
+        # Срезы массивов - представления, данные не копируются
+        values = self.values[:self.length]
+        if self.kind == 'category':
+            return pd.Series(pd.Categorical.from_codes(values, self.categories), name=name)
+        if self.kind == 'integer':
+            return pd.Series(pd.arrays.IntegerArray(values, self.mask[:self.length]), name=name, copy=False)
+        if self.kind == 'bool':
+            return pd.Series(pd.arrays.BooleanArray(values, self.mask[:self.length]), name=name, copy=False)
+        return pd.Series(values, name=name, copy=False)
+
+
+# Таблица для частых добавлений строк вместо pd.concat, который каждый раз копирует все данные.
+# Для чтения ведёт себя как DataFrame: columns, len, shape, frame[name]
+class AppendableFrame:
+    def __init__(self, frame):
+        self.columns = list(frame.columns)
+        self.length = len(frame)
+        self.store = {name: AppendColumn(frame[name]) for name in frame.columns}
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def shape(self):
+        return self.length, len(self.columns)
+
+    def __getitem__(self, name):
+        return self.store[name].to_series(name)
+
+    def append(self, row):
+        self.append_many({name: [value] for name, value in row.items()}, 1)
+
+    def append_many(self, columns, count):
+        # columns - словарь столбец -> значения длины count, остальные столбцы получают пропуски
+        unknown = [name for name in columns if name not in self.store]
+        if unknown:
+            raise KeyError(f"Unknown columns: {', '.join(unknown)}")
+        for name, column in self.store.items():
+            column.append_many(columns.get(name), count)
+        self.length += count
+
+    def to_frame(self):
+        return pd.DataFrame({name: self[name] for name in self.columns})
@@ -0,0 +1,226 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from matplotlib import dates as mdates
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: из каждой корзины берётся точка, дающая наибольший треугольник
+    # с выбранной точкой предыдущей корзины и средним следующей - форма линии сохраняется
+    n = x.size
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < threshold - 1 else n
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return x[selected], y[selected]
+
+
+def minmax_decimate(x, y, buckets):
+    # Из каждой корзины - минимум и максимум в исходном порядке: пики не теряются
+    n = x.size
+    if n <= buckets * 2:
+        return x, y
+    size = -(-n // buckets)
+    full = n // size * size
+    blocks = y[:full].reshape(-1, size)
+    offsets = np.arange(0, full, size)
+    indices = [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)]
+    if full < n:
+        tail = y[full:]
+        indices.append(np.array([full + tail.argmin(), full + tail.argmax()]))
+    selected = np.unique(np.concatenate(indices))
+    return x[selected], y[selected]
+
+
+def bin_means(x, y, bins, low, high):
+    # Средние y по равным интервалам x за один векторный проход
+    if high <= low:
+        high = low + 1
+    width = (high - low) / bins
+    positions = np.clip(((x - low) / width).astype(np.int64), 0, bins - 1)
+    sums = np.bincount(positions, weights=y, minlength=bins)
+    counts = np.bincount(positions, minlength=bins)
+    heights = np.divide(sums, counts, out=np.zeros(bins), where=counts > 0)
+    centers = low + (np.arange(bins) + 0.5) * width
+    return centers, heights, width * 0.9
+
+
+def category_counts(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        order = np.argsort(-counts, kind='stable')
+        order = order[counts[order] > 0]
+        return [str(series.cat.categories[i]) for i in order], counts[order]
+    counts = series.value_counts()
+    return [str(label) for label in counts.index], counts.to_numpy()
+
+
+# Отрисовка графиков с прореживанием до разрешения экрана.
+# Агрегаты кэшируются по (версия данных, тип, окно по x, ширина), линии и столбцы
+# обновляются через set_data/set_height и draw_idle, оси очищаются только при смене типа графика
+class ChartRenderer:
+    LINE = "Line Chart"
+    HISTOGRAM = "Histogram"
+    PIE = "Pie Chart"
+
+    def __init__(self, ax, canvas, cache_size=32):
+        self.ax = ax
+        self.canvas = canvas
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.kind = None
+        self.artist = None
+        self.data = None
+        self.version = None
+        self.series = {}
+        self.updating = False
+        self.clear_axes()
+
+    def pixels(self):
+        return max(100, int(self.ax.bbox.width))
+
+    def set_data(self, data, version):
+        if version != self.version:
+            self.data = data
+            self.version = version
+            self.series.clear()
+
+    def sorted_series(self, x_name, y_name):
+        # Даты в числа matplotlib и сортировка по x - один раз на версию данных
+        key = (x_name, y_name)
+        if key not in self.series:
+            if x_name not in self.series:
+                self.series[x_name] = mdates.date2num(pd.to_datetime(self.data[x_name], errors='coerce'))
+            x = self.series[x_name]
+            y = self.data[y_name].to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = ~(np.isnan(x) | np.isnan(y))
+            x, y = x[valid], y[valid]
+            if x.size > 1 and np.any(x[1:] < x[:-1]):
+                order = np.argsort(x, kind='stable')
+                x, y = x[order], y[order]
+            self.series[key] = (x, y)
+        return self.series[key]
+
+    def cached(self, key, compute):
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            self.cache[key] = value
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return value
+
+    def window_slice(self, x, y, window):
+        if window is None:
+            return x, y
+        start, end = np.searchsorted(x, window)
+        return x[max(0, start - 1):end + 1], y[max(0, start - 1):end + 1]
+
+    def line_points(self, window):
+        def compute():
+            x, y = self.window_slice(*self.sorted_series("Date", "Value1"), window)
+            # LTTB дороже на больших окнах, там сначала min/max прореживание
+            if x.size > self.pixels() * 50:
+                x, y = minmax_decimate(x, y, self.pixels() * 4)
+            return lttb(x, y, self.pixels() * 2)
+        return self.cached((self.version, self.LINE, window, self.pixels()), compute)
+
+    def histogram_bars(self, window):
+        def compute():
+            x, y = self.window_slice(*self.sorted_series("Date", "Value2"), window)
+            if x.size == 0:
+                return np.empty(0), np.empty(0), 0.8
+            bins = self.pixels() // 4
+            if x.size <= bins:
+                # Данных меньше, чем столбцов на экране - по столбцу на строку, как раньше
+                return x, y, 0.8
+            low, high = window if window is not None else (x[0], x[-1])
+            return bin_means(x, y, bins, low, high)
+        return self.cached((self.version, self.HISTOGRAM, window, self.pixels()), compute)
+
+    def plot(self, kind, window=None):
+        self.updating = True
+        try:
+            if kind == self.LINE:
+                self.plot_line(window)
+            elif kind == self.HISTOGRAM:
+                self.plot_histogram(window)
+            elif kind == self.PIE:
+                self.plot_pie()
+        finally:
+            self.updating = False
+        self.canvas.draw_idle()
+
+    def clear_axes(self):
+        # clear() пересоздаёт и реестр обработчиков осей, подписку нужно вернуть
+        self.ax.clear()
+        # После круговой диаграммы оси остаются квадратными и без рамки
+        self.ax.set_aspect('auto')
+        self.ax.set_frame_on(True)
+        self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.artist = None
+
+    def reset_axes(self, kind):
+        if self.kind != kind:
+            self.clear_axes()
+            self.kind = kind
+
+    def plot_line(self, window):
+        x, y = self.line_points(window)
+        self.reset_axes(self.LINE)
+        if self.artist is None:
+            self.artist, = self.ax.plot(x, y, label="Value1")
+            self.ax.xaxis_date()
+            self.ax.set_xlabel("Date")
+            self.ax.legend()
+        else:
+            self.artist.set_data(x, y)
+        if window is None:
+            self.ax.relim()
+            self.ax.autoscale_view()
+
+    def plot_histogram(self, window):
+        x, heights, width = self.histogram_bars(window)
+        self.reset_axes(self.HISTOGRAM)
+        if self.artist is not None and len(self.artist) == x.size:
+            for rect, left, height in zip(self.artist, x - width / 2, heights):
+                rect.set_x(left)
+                rect.set_width(width)
+                rect.set_height(height)
+        else:
+            if self.artist is not None:
+                self.artist.remove()
+            self.artist = self.ax.bar(x, heights, width=width, color="C0")
+            self.ax.xaxis_date()
+        if window is None:
+            self.ax.relim()
+            self.ax.autoscale_view()
+
+    def plot_pie(self):
+        labels, counts = self.cached((self.version, self.PIE), lambda: category_counts(self.data["Category"]))
+        self.clear_axes()
+        self.kind = self.PIE
+        self.ax.pie(counts, labels=labels, autopct='%1.1f%%')
+        self.ax.set_ylabel("count")
+
+    def on_xlim_changed(self, ax):
+        # Приближение или сдвиг панелью инструментов: пересчитываем точки для видимого окна
+        if self.updating or self.kind not in (self.LINE, self.HISTOGRAM) or self.data is None:
+            return
+        self.plot(self.kind, tuple(float(limit) for limit in ax.get_xlim()))
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# Размер выборки для приближённых квантилей
+SAMPLE_SIZE = 10000
+
+
+def is_stats_column(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+# Статистика одного столбца: min/max, среднее и дисперсия по Уэлфорду, квантили по reservoir-выборке.
+# Добавление одного значения - O(1), пачки - один векторный проход
+class ColumnStats:
+    def __init__(self, sample_size=SAMPLE_SIZE, rng=None):
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sample = np.empty(sample_size)
+        self.sample_len = 0
+        self.seen = 0
+        self.rng = rng or np.random.default_rng()
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return self.variance ** 0.5
+
+    def update(self, value):
+        if value is None or value != value:
+            self.nulls += 1
+            return
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self._sample_one(value)
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        nulls = int(missing.sum())
+        if nulls:
+            values = values[~missing]
+        self.nulls += nulls
+        n = values.size
+        if not n:
+            return
+        # Слияние с накопленным по формуле Чана: как будто значения добавлялись по одному
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self._sample_many(values)
+
+    def _sample_one(self, value):
+        size = self.sample.size
+        if self.sample_len < size:
+            self.sample[self.sample_len] = value
+            self.sample_len += 1
+        else:
+            slot = self.rng.integers(0, self.seen + 1)
+            if slot < size:
+                self.sample[slot] = value
+        self.seen += 1
+
+    def _sample_many(self, values):
+        size = self.sample.size
+        free = min(size - self.sample_len, values.size)
+        if free:
+            self.sample[self.sample_len:self.sample_len + free] = values[:free]
+            self.sample_len += free
+            self.seen += free
+            values = values[free:]
+        if values.size:
+            # Алгоритм R сразу для всей пачки: i-й элемент попадает в случайный слот с вероятностью size / (seen + i + 1)
+            slots = self.rng.integers(0, self.seen + np.arange(1, values.size + 1))
+            accepted = slots < size
+            self.sample[slots[accepted]] = values[accepted]
+            self.seen += values.size
+
+    def quantile(self, q):
+        if not self.sample_len:
+            return None
+        return float(np.quantile(self.sample[:self.sample_len], q))
+
+
+# Статистика по всем числовым столбцам таблицы
+class StatsEngine:
+    def __init__(self):
+        self.rows = 0
+        self.column_names = []
+        self.columns = {}
+
+    def reset(self, frame):
+        self.rows = len(frame)
+        self.column_names = list(frame.columns)
+        self.columns = {}
+        for name in frame.columns:
+            if is_stats_column(frame[name].dtype):
+                stats = ColumnStats()
+                stats.update_many(frame[name].to_numpy(dtype=np.float64, na_value=np.nan))
+                self.columns[name] = stats
+
+    def append(self, row):
+        # row - словарь столбец -> значение, отсутствующие столбцы считаются пропусками
+        self.rows += 1
+        for name, stats in self.columns.items():
+            stats.update(row.get(name))
+
+    def append_many(self, columns, count):
+        self.rows += count
+        for name, stats in self.columns.items():
+            values = columns.get(name)
+            if values is None:
+                stats.nulls += count
+            else:
+                stats.update_many(values)
+
+    def text(self):
+        lines = [f"Rows: {self.rows}, Columns: {len(self.column_names)}"]
+        for name, stats in self.columns.items():
+            if not stats.count:
+                lines.append(f"{name}: no values, Nulls={stats.nulls}")
+                continue
+            lines.append(
+                f"{name}: Min={stats.min:g}, Max={stats.max:g}, Mean={stats.mean:.4g}, Std={stats.std:.4g}, "
+                f"Median~{stats.quantile(0.5):.4g}, P95~{stats.quantile(0.95):.4g}, Nulls={stats.nulls}"
+            )
+        return "\n".join(lines) + "\n"
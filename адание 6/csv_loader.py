@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+CHUNK_ROWS = 200000
+
+DEFAULT_CACHE_DIR = os.environ.get('LAB6_COLUMN_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'lab6-columns'))
+
+DATE_COLUMNS = ('Date',)
+CATEGORY_COLUMNS = ('Category',)
+
+
+class LoadInterrupted(Exception):
+    pass
+
+
+def optimize_chunk(chunk):
+    # Даты разбираются сразу, строки становятся категориями, float64 -> float32.
+    # Целые сужаются в finalize, когда известен диапазон по всему файлу
+    for name in chunk.columns:
+        series = chunk[name]
+        if name in DATE_COLUMNS:
+            chunk[name] = pd.to_datetime(series, errors='coerce')
+        elif name in CATEGORY_COLUMNS or pd.api.types.is_object_dtype(series) \
+                or pd.api.types.is_string_dtype(series):
+            chunk[name] = series.astype('category')
+        elif pd.api.types.is_float_dtype(series):
+            chunk[name] = series.astype(np.float32)
+    return chunk
+
+
+def combine_chunks(chunks):
+    columns = {}
+    for name in chunks[0].columns:
+        parts = [chunk[name] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            # Категории в пачках разные, обычный concat превратил бы столбец обратно в строки
+            columns[name] = pd.Series(union_categoricals(parts, ignore_order=True), name=name)
+        else:
+            columns[name] = finalize_column(pd.concat(parts, ignore_index=True))
+    return pd.DataFrame(columns)
+
+
+def finalize_column(series):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series):
+        return series.astype(np.float32)
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return series.astype('category')
+
+
+def read_csv_chunked(path, chunk_rows=CHUNK_ROWS, progress=None, interrupted=None):
+    size = os.path.getsize(path) or 1
+    chunks = []
+    percent = -1
+    with open(path, 'rb') as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_rows):
+            if interrupted is not None and interrupted():
+                raise LoadInterrupted()
+            chunks.append(optimize_chunk(chunk))
+            if progress is not None:
+                # Прогресс по прочитанным байтам файла
+                current = min(99, f.tell() * 100 // size)
+                if current != percent:
+                    percent = current
+                    progress(percent)
+    if not chunks:
+        return pd.read_csv(path)
+    return combine_chunks(chunks)
+
+
+# Столбцовый кэш: каждый столбец - отдельный .npy, при открытии отображается в память (mmap),
+# поэтому повторное открытие того же файла почти мгновенно и не читает данные целиком
+def cache_dir_for(path, cache_dir=DEFAULT_CACHE_DIR):
+    stat = os.stat(path)
+    key = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}'
+    return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+
+def save_cache(frame, directory):
+    tmp_dir = directory + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    columns = []
+    for number, name in enumerate(frame.columns):
+        series = frame[name]
+        file_name = f'{number}.npy'
+        column = {'name': name, 'file': file_name}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            column['kind'] = 'category'
+            column['categories'] = series.cat.categories.tolist()
+            values = series.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            column['kind'] = 'datetime'
+            values = series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        else:
+            column['kind'] = 'array'
+            values = series.to_numpy()
+        np.save(os.path.join(tmp_dir, file_name), values, allow_pickle=False)
+        columns.append(column)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'rows': len(frame), 'columns': columns}, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+
+def load_cache(directory):
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    columns = {}
+    for column in meta['columns']:
+        values = np.load(os.path.join(directory, column['file']), mmap_mode='r', allow_pickle=False)
+        if column['kind'] == 'category':
+            columns[column['name']] = pd.Categorical.from_codes(values, column['categories'])
+        elif column['kind'] == 'datetime':
+            columns[column['name']] = pd.Series(values.view('datetime64[ns]'), copy=False)
+        else:
+            columns[column['name']] = pd.Series(values, copy=False)
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_csv(path, chunk_rows=CHUNK_ROWS, progress=None, interrupted=None, use_cache=False,
+             cache_dir=DEFAULT_CACHE_DIR):
+    # Возвращает (таблица, взята ли она из кэша)
+    if use_cache:
+        directory = cache_dir_for(path, cache_dir)
+        if os.path.exists(os.path.join(directory, 'meta.json')):
+            return load_cache(directory), True
+    frame = read_csv_chunked(path, chunk_rows, progress, interrupted)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_cache(frame, directory)
+    return frame, False